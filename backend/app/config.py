@@ -4,9 +4,67 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     gemini_api_key: str = ""
     gemini_model: str = "gemini-2.5-flash"
+    # Upstream endpoints; overridden to point at local fakes in benchmarks.
+    gemini_base_url: str = ""
+    deepgram_base_url: str = ""
+    elevenlabs_base_url: str = "https://api.elevenlabs.io/v1"
+    # Per-upstream limits on in-flight calls and request rate; a rate of 0
+    # means no rate limit.
+    gemini_max_concurrency: int = 16
+    gemini_requests_per_second: float = 0.0
+    deepgram_max_concurrency: int = 32
+    deepgram_requests_per_second: float = 0.0
+    elevenlabs_max_concurrency: int = 8
+    elevenlabs_requests_per_second: float = 0.0
+    upstream_max_retries: int = 2
+    upstream_retry_base_seconds: float = 0.5
+    # Queue time after which a call outranks fresh calls one lane above it.
+    upstream_lane_aging_seconds: float = 2.0
+    context_cache_enabled: bool = True
+    context_cache_ttl_seconds: float = 3600.0
+    context_cache_min_tokens: int = 1024
+    context_cache_max_entries: int = 256
     deepgram_api_key: str = ""
     elevenlabs_api_key: str = ""
     elevenlabs_voice_id: str = "21m00Tcm4TlvDq8ikWAM"
+    http2_enabled: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 30.0
+    http_connect_timeout: float = 5.0
+    image_max_edge: int = 1024
+    image_format: str = "JPEG"
+    image_quality: int = 80
+    image_index_max_entries: int = 4096
+    image_index_max_distance: int = 5
+    voice_catalog_ttl_seconds: float = 600.0
+    identify_deadline_seconds: float = 30.0
+    identify_hedge_enabled: bool = True
+    identify_hedge_percentile: float = 0.95
+    research_timeout_seconds: float = 30.0
+    character_timeout_seconds: float = 30.0
+    voice_timeout_seconds: float = 30.0
+    voice_reuse_enabled: bool = True
+    voice_reuse_min_similarity: float = 0.6
+    voice_registry_db_path: str = ""
+    voice_registry_max_entries: int = 2048
+    voice_design_mode: str = "sync"
+    speech_pipeline_lookahead: int = 2
+    character_cache_max_entries: int = 512
+    character_cache_ttl_seconds: float = 7 * 24 * 3600
+    character_cache_db_path: str = ""
+    character_pack_path: str = ""
+    character_cache_disk_max_entries: int = 0
+    audio_cache_enabled: bool = True
+    audio_cache_dir: str = ""
+    audio_cache_max_bytes: int = 256 * 1024 * 1024
+    session_ttl_seconds: float = 3600.0
+    session_max_entries: int = 10000
+    session_history_max_messages: int = 200
+    chat_history_token_budget: int = 1000
+    chat_summary_max_entries: int = 4096
+    session_redis_url: str = ""
     allowed_origins: str = "http://localhost:3000,http://127.0.0.1:3000"
 
     model_config = {"env_file": ".env"}
@@ -1,8 +1,16 @@
+import asyncio
+import json
 import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Awaitable, Callable
 
-from fastapi import FastAPI, UploadFile, File
+import orjson
+from fastapi import FastAPI, HTTPException, UploadFile, File, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from pydantic import BaseModel
 
 from app.config import settings
 from app.models.schemas import (
@@ -12,18 +20,54 @@ from app.models.schemas import (
     RecharacterizeRequest,
     ChatRequest,
     ChatResponse,
+    ChatSpeechRequest,
+    ChatSession,
+    ConversationMessage,
+    SessionChatRequest,
     SpeechToTextResponse,
     TextToSpeechRequest,
 )
 from app.services.gemini_service import (
     identify_research_and_create,
+    identify_research_and_create_from_image,
     create_character_from_entity,
     generate_chat_response,
+    generate_reply,
+    render_system_prompt,
+    stream_chat_response,
+    stream_reply,
 )
-from app.services.deepgram_service import transcribe
-from app.services.elevenlabs_service import generate_speech
+from app.services.deepgram_service import live_transcription, transcribe
+from app.services.audio_cache import audio_cache
+from app.services.character_cache import character_cache
+from app.services.clients import clients
+from app.services.context_cache import context_cache
+from app.services.elevenlabs_service import cached_speech, stream_speech
+from app.services.history import history_manager, trim_history
+from app.services.image_index import image_index
+from app.services.metrics import (
+    FALLBACKS,
+    PAYLOAD_BYTES,
+    CacheStatsCollector,
+    RequestMetricsMiddleware,
+)
+from app.services.scheduler import deepgram_scheduler, elevenlabs_scheduler, gemini_scheduler
+from app.services.session_store import new_session, session_store
+from app.services.speech_pipeline import split_sentences, synthesize_sentences
+from app.services.voice_registry import voice_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await clients.start()
+    try:
+        yield
+    finally:
+        await session_store.close()
+        await clients.close()
 
-app = FastAPI(title="CurioCity API")
+
+app = FastAPI(title="CurioCity API", lifespan=lifespan, default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
 
 app.add_middleware(
@@ -33,6 +77,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+REGISTRY.register(
+    CacheStatsCollector(
+        {
+            "character": character_cache.stats,
+            "audio": lambda: audio_cache.stats() if audio_cache is not None else None,
+            "image_index": image_index.stats,
+            "context": context_cache.stats,
+            "voice_registry": voice_registry.stats,
+        }
+    )
+)
 
 
 @app.get("/health")
@@ -40,38 +97,255 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus exposition of this worker's latency, size and cache metrics."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/stats")
+async def stats():
+    return {
+        "character_cache": character_cache.stats(),
+        "audio_cache": audio_cache.stats() if audio_cache is not None else None,
+        "image_index": image_index.stats(),
+        "sessions": session_store.stats(),
+        "context_cache": context_cache.stats(),
+        "history": history_manager.stats(),
+        "upstreams": {
+            scheduler.service: scheduler.stats()
+            for scheduler in (gemini_scheduler, deepgram_scheduler, elevenlabs_scheduler)
+        },
+    }
+
+
+def _model_response(model: BaseModel) -> Response:
+    """model as JSON bytes straight from pydantic-core, without re-validation.
+
+    The route's response_model then only documents the schema; the models
+    returned here were validated when they were built. Serializing to bytes
+    also skips the str that model_dump_json() builds and Response re-encodes.
+    """
+    return Response(model.__pydantic_serializer__.to_json(model), media_type="application/json")
+
+
+def _ndjson_line(event: dict) -> bytes:
+    return orjson.dumps(event) + b"\n"
+
+
+def _fallback_identify_response(name: str, greeting: str) -> IdentifyResponse:
+    FALLBACKS.labels("identify").inc()
+    fallback_profile = CharacterProfile(
+        name=name,
+        backstory="I'm a mystery! Nobody knows where I came from, but I love making new friends and learning about the world.",
+        personality_traits=["curious", "friendly", "silly", "adventurous", "kind"],
+        speaking_style="Speaks with wonder and excitement, asks lots of questions back.",
+        voice_description="A friendly, curious young voice full of energy and wonder",
+        fun_facts=["I love surprises!", "Everything is an adventure!", "I make friends everywhere I go!"],
+        research_summary="A mystery object with unknown origins, designed to keep kids curious and exploring.",
+        canonical_facts=["Its exact identity is unknown.", "It loves curiosity and questions."],
+        source_urls=[],
+    )
+    return IdentifyResponse(
+        entity=name,
+        greeting=greeting,
+        character_profile=fallback_profile,
+        voice_id=settings.elevenlabs_voice_id,
+    )
+
+
+async def _with_session(result: IdentifyResponse) -> IdentifyResponse:
+    """Copy of result carrying the id of a new chat session for its character.
+
+    The cached response is shared between visitors, so the id only ever goes
+    on a copy. Sessions are an optimisation: if the store is down the client
+    still gets its character and falls back to stateless /api/chat.
+    """
+    session = new_session(
+        result.entity,
+        result.voice_id,
+        render_system_prompt(result.character_profile),
+        result.greeting,
+    )
+    try:
+        await session_store.save(session)
+    except Exception:
+        logger.exception("Failed to start chat session for entity: %s", result.entity)
+        return result
+    return result.model_copy(update={"session_id": session.session_id})
+
+
 @app.post("/api/identify", response_model=IdentifyResponse)
 async def identify(req: IdentifyRequest):
     try:
         result = await identify_research_and_create(req.image)
-        return result
     except Exception:
         logger.exception("Identify pipeline failed; returning fallback profile")
-        fallback_profile = CharacterProfile(
-            name="Mystery Thing",
-            backstory="I'm a mystery! Nobody knows where I came from, but I love making new friends and learning about the world.",
-            personality_traits=["curious", "friendly", "silly", "adventurous", "kind"],
-            speaking_style="Speaks with wonder and excitement, asks lots of questions back.",
-            voice_description="A friendly, curious young voice full of energy and wonder",
-            fun_facts=["I love surprises!", "Everything is an adventure!", "I make friends everywhere I go!"],
-            research_summary="A mystery object with unknown origins, designed to keep kids curious and exploring.",
-            canonical_facts=["Its exact identity is unknown.", "It loves curiosity and questions."],
-            source_urls=[],
+        result = _fallback_identify_response(
+            "Mystery Thing", "Hi! I'm a Mystery Thing! 🤔 Ask me anything!"
         )
-        return IdentifyResponse(
-            entity="Mystery Thing",
-            greeting="Hi! I'm a Mystery Thing! 🤔 Ask me anything!",
-            character_profile=fallback_profile,
-            voice_id=settings.elevenlabs_voice_id,
+    return _model_response(await _with_session(result))
+
+
+@app.post("/api/identify/stream")
+async def identify_stream(req: IdentifyRequest):
+    """NDJSON variant of /api/identify emitting each stage as soon as it finishes."""
+    events: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def on_event(stage: str, payload: dict) -> None:
+        events.put_nowait({"type": stage, **payload})
+
+    async def run() -> None:
+        try:
+            result = await identify_research_and_create(req.image, on_event)
+        except Exception:
+            logger.exception("Identify stream pipeline failed; returning fallback profile")
+            result = _fallback_identify_response(
+                "Mystery Thing", "Hi! I'm a Mystery Thing! 🤔 Ask me anything!"
+            )
+        result = await _with_session(result)
+        events.put_nowait({"type": "done", "result": result.model_dump()})
+        events.put_nowait(None)
+
+    async def lines() -> AsyncIterator[bytes]:
+        task = asyncio.create_task(run())
+        try:
+            while (event := await events.get()) is not None:
+                yield _ndjson_line(event)
+        finally:
+            # On disconnect; the shared character build keeps running in the
+            # cache's own task, so its result is not lost.
+            task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/identify/upload", response_model=IdentifyResponse)
+async def identify_upload(image: UploadFile = File(...)):
+    """Multipart variant of /api/identify that skips the base64 JSON body."""
+    try:
+        result = await identify_research_and_create_from_image(
+            image.content_type or "image/jpeg", image.file
+        )
+    except Exception:
+        logger.exception("Identify upload pipeline failed; returning fallback profile")
+        result = _fallback_identify_response(
+            "Mystery Thing", "Hi! I'm a Mystery Thing! 🤔 Ask me anything!"
         )
+    return _model_response(await _with_session(result))
 
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     response = await generate_chat_response(
-        req.character_profile, req.conversation_history[-10:]
+        req.character_profile, req.conversation_history
     )
-    return ChatResponse(response=response)
+    return _model_response(ChatResponse(response=response))
+
+
+def _ndjson_chat(deltas: AsyncIterator[str], entity: str) -> StreamingResponse:
+    """NDJSON delta events as tokens arrive, then a done event with timings."""
+
+    async def events() -> AsyncIterator[bytes]:
+        start = time.perf_counter()
+        ttft_ms: float | None = None
+        parts: list[str] = []
+        try:
+            async for delta in deltas:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                parts.append(delta)
+                yield _ndjson_line({"type": "delta", "text": delta})
+        except Exception:
+            logger.exception("Streaming chat failed for entity: %s", entity)
+            yield _ndjson_line({"type": "error"})
+            return
+        total_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            "chat stream entity=%s ttft_ms=%.0f total_ms=%.0f",
+            entity,
+            ttft_ms or total_ms,
+            total_ms,
+        )
+        yield _ndjson_line(
+            {
+                "type": "done",
+                "response": "".join(parts).strip(),
+                "ttft_ms": round(ttft_ms or total_ms, 1),
+                "total_ms": round(total_ms, 1),
+            }
+        )
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """NDJSON variant of /api/chat."""
+    deltas = stream_chat_response(req.character_profile, req.conversation_history)
+    return _ndjson_chat(deltas, req.entity)
+
+
+@app.post("/api/chat/speech")
+async def chat_speech(req: ChatSpeechRequest):
+    """Stream the spoken reply, synthesizing each sentence as soon as it is generated."""
+    sentences = split_sentences(
+        stream_chat_response(req.character_profile, req.conversation_history)
+    )
+    audio_stream = synthesize_sentences(sentences, req.voice_id)
+    return StreamingResponse(audio_stream, media_type="audio/mpeg")
+
+
+async def _session_turn(req: SessionChatRequest) -> ChatSession:
+    """The request's session with the new user message appended."""
+    session = await session_store.get(req.session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    session.history.append(ConversationMessage(role="user", text=req.message))
+    return session
+
+
+async def _end_turn(session: ChatSession, reply: str) -> None:
+    session.history.append(ConversationMessage(role="assistant", text=reply))
+    trim_history(session, settings.session_history_max_messages)
+    await session_store.save(session)
+
+
+async def _recorded(session: ChatSession, deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Pass deltas through, saving the full reply to the session once it completes."""
+    parts: list[str] = []
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+    await _end_turn(session, "".join(parts).strip())
+
+
+def _session_deltas(session: ChatSession) -> AsyncIterator[str]:
+    deltas = stream_reply(session.system_prompt, session.history, session)
+    return _recorded(session, deltas)
+
+
+@app.post("/api/chat/session", response_model=ChatResponse)
+async def chat_session(req: SessionChatRequest):
+    """/api/chat for a session from identify: only the new message is sent."""
+    session = await _session_turn(req)
+    response = await generate_reply(session.system_prompt, session.history, session)
+    await _end_turn(session, response)
+    return _model_response(ChatResponse(response=response))
+
+
+@app.post("/api/chat/session/stream")
+async def chat_session_stream(req: SessionChatRequest):
+    session = await _session_turn(req)
+    return _ndjson_chat(_session_deltas(session), session.entity)
+
+
+@app.post("/api/chat/session/speech")
+async def chat_session_speech(req: SessionChatRequest):
+    session = await _session_turn(req)
+    sentences = split_sentences(_session_deltas(session))
+    audio_stream = synthesize_sentences(sentences, session.voice_id)
+    return StreamingResponse(audio_stream, media_type="audio/mpeg")
 
 
 @app.post("/api/recharacterize", response_model=IdentifyResponse)
@@ -80,36 +354,215 @@ async def recharacterize(req: RecharacterizeRequest):
         entity = req.entity.strip()
         if not entity:
             raise ValueError("entity is required")
-        return await create_character_from_entity(entity)
+        result = await create_character_from_entity(entity)
     except Exception:
         logger.exception("Recharacterize failed; returning fallback profile")
-        fallback_profile = CharacterProfile(
-            name=req.entity.strip() or "Mystery Thing",
-            backstory="I'm a mystery! Nobody knows where I came from, but I love making new friends and learning about the world.",
-            personality_traits=["curious", "friendly", "silly", "adventurous", "kind"],
-            speaking_style="Speaks with wonder and excitement, asks lots of questions back.",
-            voice_description="A friendly, curious young voice full of energy and wonder",
-            fun_facts=["I love surprises!", "Everything is an adventure!", "I make friends everywhere I go!"],
-            research_summary="A mystery object with unknown origins, designed to keep kids curious and exploring.",
-            canonical_facts=["Its exact identity is unknown.", "It loves curiosity and questions."],
-            source_urls=[],
-        )
-        return IdentifyResponse(
-            entity=fallback_profile.name,
-            greeting=f"Hi! I'm {fallback_profile.name}! 🤔 Ask me anything!",
-            character_profile=fallback_profile,
-            voice_id=settings.elevenlabs_voice_id,
-        )
+        name = req.entity.strip() or "Mystery Thing"
+        result = _fallback_identify_response(name, f"Hi! I'm {name}! 🤔 Ask me anything!")
+    return _model_response(await _with_session(result))
+
+
+_UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+async def _upload_chunks(upload: UploadFile) -> AsyncIterator[bytes]:
+    size = 0
+    while chunk := await upload.read(_UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        yield chunk
+    PAYLOAD_BYTES.labels("stt_upload").observe(size)
 
 
 @app.post("/api/speech-to-text", response_model=SpeechToTextResponse)
 async def speech_to_text(audio: UploadFile = File(...)):
-    audio_bytes = await audio.read()
-    result = await transcribe(audio_bytes)
-    return result
+    # The multipart parser has already spooled the whole upload (to a temp
+    # file past 1 MB); relay it from there in chunks rather than as one bytes.
+    return _model_response(await transcribe(_upload_chunks(audio)))
+
+
+@app.websocket("/api/speech-to-text/live")
+async def speech_to_text_live(
+    websocket: WebSocket, encoding: str | None = None, sample_rate: int | None = None
+):
+    """Relay microphone audio to Deepgram's streaming API as it is recorded.
+
+    Binary frames carry audio; a text frame {"type": "stop"} ends the stream.
+    Transcript events are sent back as JSON, then {"type": "done"} once the
+    final result for the last words has arrived.
+    """
+    await websocket.accept()
+
+    async def relay(event: dict) -> None:
+        # The client may already be gone while Deepgram is still answering.
+        with suppress(WebSocketDisconnect, RuntimeError):
+            await websocket.send_json(event)
+
+    try:
+        async with live_transcription(relay, encoding, sample_rate) as send_audio:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes"):
+                    await send_audio(message["bytes"])
+                elif message.get("text") and json.loads(message["text"]).get("type") == "stop":
+                    break
+    except WebSocketDisconnect:
+        return
+    except Exception:
+        logger.exception("Live transcription failed")
+        await relay({"type": "error"})
+        await websocket.close(code=1011)
+        return
+    await websocket.close()
+
+
+EventSender = Callable[[dict], Awaitable[None]]
+
+
+async def _receive(websocket: WebSocket) -> dict:
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message
+
+
+def _is_end_of_turn(message: dict) -> bool:
+    return bool(message.get("text")) and json.loads(message["text"]).get("type") == "end"
+
+
+async def _hear_turn(
+    websocket: WebSocket, send_event: EventSender, encoding: str | None, sample_rate: int | None
+) -> tuple[str, float]:
+    """Relay one utterance to Deepgram; its final transcript and when the client ended it."""
+    message = await _receive(websocket)
+    if _is_end_of_turn(message):
+        return "", time.perf_counter()
+    finals: list[str] = []
+
+    async def on_event(event: dict) -> None:
+        if event["type"] == "transcript" and event["is_final"]:
+            finals.append(event["transcript"])
+        if event["type"] != "done":
+            await send_event(event)
+
+    # Deepgram is connected on the turn's first frame, while the child is
+    # still talking, and flushed as soon as the end message arrives.
+    async with live_transcription(on_event, encoding, sample_rate) as send_audio:
+        while not _is_end_of_turn(message):
+            if message.get("bytes"):
+                await send_audio(message["bytes"])
+            message = await _receive(websocket)
+        ended_at = time.perf_counter()
+    return " ".join(finals).strip(), ended_at
+
+
+async def _answer_turn(
+    websocket: WebSocket,
+    send_event: EventSender,
+    session: ChatSession,
+    transcript: str,
+    ended_at: float,
+) -> None:
+    """Stream the reply as text deltas and sentence-by-sentence MP3 frames."""
+    timings: dict[str, float] = {}
+
+    async def mark(stage: str) -> None:
+        timings[f"{stage}_ms"] = round((time.perf_counter() - ended_at) * 1000, 1)
+        await send_event({"type": "timing", "stage": stage, "ms": timings[f"{stage}_ms"]})
+
+    await mark("transcribe")
+    parts: list[str] = []
+    failed = False
+
+    async def deltas() -> AsyncIterator[str]:
+        nonlocal failed
+        try:
+            async for delta in _session_deltas(session):
+                if not parts:
+                    await mark("first_token")
+                parts.append(delta)
+                await send_event({"type": "delta", "text": delta})
+                yield delta
+        except Exception:
+            failed = True
+            raise
+
+    first_audio = True
+    async for chunk in synthesize_sentences(split_sentences(deltas()), session.voice_id):
+        if first_audio:
+            first_audio = False
+            await mark("first_audio")
+        await websocket.send_bytes(chunk)
+    await mark("total")
+    if failed:
+        await send_event({"type": "error"})
+    await send_event(
+        {
+            "type": "done",
+            "transcript": transcript,
+            "response": "".join(parts).strip(),
+            "timings": timings,
+        }
+    )
+
+
+@app.websocket("/api/voice-turn")
+async def voice_turn(
+    websocket: WebSocket,
+    session_id: str,
+    encoding: str | None = None,
+    sample_rate: int | None = None,
+):
+    """Audio in, audio out on one connection, for a session from identify.
+
+    Each turn the client streams binary audio frames, then {"type": "end"}.
+    The server relays live transcript events, then the reply as
+    {"type": "delta"} events interleaved with binary MP3 frames, sentence by
+    sentence, plus {"type": "timing"} events as each stage completes, and
+    ends the turn with {"type": "done"}. The socket stays open for more turns.
+    """
+    await websocket.accept()
+    if await session_store.get(session_id) is None:
+        await websocket.close(code=4404, reason="Unknown or expired session")
+        return
+
+    async def send_event(event: dict) -> None:
+        with suppress(WebSocketDisconnect, RuntimeError):
+            await websocket.send_json(event)
+
+    try:
+        while True:
+            transcript, ended_at = await _hear_turn(websocket, send_event, encoding, sample_rate)
+            if not transcript:
+                await send_event({"type": "done", "transcript": "", "response": "", "timings": {}})
+                continue
+            try:
+                session = await _session_turn(
+                    SessionChatRequest(session_id=session_id, message=transcript)
+                )
+            except HTTPException as exc:
+                await send_event({"type": "error", "detail": exc.detail})
+                await websocket.close(code=4404)
+                return
+            await _answer_turn(websocket, send_event, session, transcript, ended_at)
+    except WebSocketDisconnect:
+        return
+    except Exception:
+        logger.exception("Voice turn failed for session %s", session_id)
+        await send_event({"type": "error"})
+        with suppress(RuntimeError):
+            await websocket.close(code=1011)
 
 
 @app.post("/api/text-to-speech")
 async def text_to_speech(req: TextToSpeechRequest):
-    audio_stream = await generate_speech(req.text, req.voice_id)
+    cached = await cached_speech(req.text, req.voice_id)
+    if cached is not None:
+        return StreamingResponse(
+            cached.chunks(),
+            media_type="audio/mpeg",
+            headers={"Content-Length": str(cached.size)},
+        )
+    audio_stream = await stream_speech(req.text, req.voice_id, check_cache=False)
     return StreamingResponse(audio_stream, media_type="audio/mpeg")
@@ -22,6 +22,8 @@ class IdentifyResponse(BaseModel):
     greeting: str
     character_profile: CharacterProfile
     voice_id: str
+    # Set by the identify endpoints; pass to /api/chat/session.
+    session_id: str | None = None
 
 
 class RecharacterizeRequest(BaseModel):
@@ -39,6 +41,28 @@ class ChatRequest(BaseModel):
     conversation_history: list[ConversationMessage]
 
 
+class ChatSpeechRequest(ChatRequest):
+    voice_id: str
+
+
+class ChatSession(BaseModel):
+    """Server-side conversation state, referenced by session_id."""
+
+    session_id: str
+    entity: str
+    voice_id: str
+    system_prompt: str
+    history: list[ConversationMessage] = Field(default_factory=list)
+    # Oldest messages dropped from history, and their chained digest.
+    trimmed: int = 0
+    trimmed_digest: str = ""
+
+
+class SessionChatRequest(BaseModel):
+    session_id: str
+    message: str
+
+
 class ChatResponse(BaseModel):
     response: str
 
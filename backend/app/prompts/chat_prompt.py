@@ -30,3 +30,18 @@ Rules:
 - If asked something outside your knowledge, respond in character about what you DO know
 - Never break character or mention being an AI
 - Show genuine personality — be warm, quirky, and memorable"""
+
+
+CHAT_SUMMARY_CONTEXT_TEMPLATE = """(What we talked about earlier in this conversation: {summary})"""
+
+CHAT_SUMMARY_PROMPT_TEMPLATE = """You keep short notes on a conversation between a child and a talking character.
+
+NOTES SO FAR:
+{summary}
+
+NEW MESSAGES:
+{transcript}
+
+Rewrite the notes to include the new messages, in at most 6 short sentences.
+Keep the child's name, interests and questions, anything the character promised
+or asked, and facts already told. Return only the notes."""
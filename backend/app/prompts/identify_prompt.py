@@ -1,3 +1,6 @@
+# Bump whenever a prompt below changes so cached characters are rebuilt.
+PROMPT_VERSION = "2"
+
 IDENTIFY_PROMPT = """Look at this image and identify the single main object, animal, landmark, or thing in it.
 If the photo includes a phone, tablet, monitor, or printed page that shows the main subject, identify the subject shown inside that screen/page (not the surrounding hand or room).
 If the subject is a historical person, return their proper full name.
@@ -33,16 +36,16 @@ Based on the following research about "{entity}", create a vivid first-person ch
 RESEARCH:
 {research}
 
-Respond in EXACTLY this JSON format (no markdown, no code fences, no extra text):
+Respond in EXACTLY this JSON format, with the keys in this order (no markdown, no code fences, no extra text):
 {{
   "name": "A fun, memorable name for this character (e.g. 'Lady Liberty' for Statue of Liberty)",
+  "voice_description": "A 50-200 character description of the ideal speaking voice for this character. Describe age, gender, accent, tone, energy. Example: 'A warm, wise elderly woman with a slight French accent, speaking slowly and grandly'",
+  "greeting": "A 1-2 sentence excited greeting in character, introducing themselves to a curious child. Include an emoji.",
   "backstory": "A 2-3 paragraph first-person backstory. Rich, emotional, historically grounded. Written as if the entity is telling its own life story to a child.",
   "personality_traits": ["trait1", "trait2", "trait3", "trait4", "trait5"],
   "speaking_style": "A 2-3 sentence description of how this character speaks. Include tone, vocabulary level, verbal quirks, catchphrases.",
-  "voice_description": "A 50-200 character description of the ideal speaking voice for this character. Describe age, gender, accent, tone, energy. Example: 'A warm, wise elderly woman with a slight French accent, speaking slowly and grandly'",
   "fun_facts": ["fact1", "fact2", "fact3"],
-  "canonical_facts": ["fact 1", "fact 2", "fact 3", "fact 4", "fact 5"],
-  "greeting": "A 1-2 sentence excited greeting in character, introducing themselves to a curious child. Include an emoji."
+  "canonical_facts": ["fact 1", "fact 2", "fact 3", "fact 4", "fact 5"]
 }}
 
 Make the character age-appropriate for children 4-10. Be creative and educational."""
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Callable, NamedTuple
+
+import anyio
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_READ_CHUNK_BYTES = 64 * 1024
+
+
+class CachedAudio(NamedTuple):
+    """A cache hit, already open so that a concurrent eviction cannot pull the
+    file away while it is being served."""
+
+    file: BinaryIO
+    size: int
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        async with anyio.wrap_file(self.file) as audio_file:
+            while chunk := await audio_file.read(_READ_CHUNK_BYTES):
+                yield chunk
+
+
+class AudioCache:
+    """Size-bounded on-disk LRU of synthesized MP3s, one file per content hash.
+
+    Several workers may share the directory, so nothing relies on this
+    process's view of it: a hit touches the file's mtime, and after each
+    write the directory is scanned and the least recently used files are
+    deleted until everyone's files fit in max_bytes together.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._entries = 0
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.mp3"
+
+    def _evict(self) -> None:
+        """Delete least recently used files until the directory fits max_bytes."""
+        entries = []
+        with os.scandir(self._dir) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".mp3"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        size = sum(file_size for _, file_size, _ in entries)
+        while size > self._max_bytes and len(entries) > 1:
+            _, file_size, path = entries.pop(0)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # evicted by another worker
+            except OSError:
+                logger.exception("Failed to evict cached audio %s", path)
+                continue
+            size -= file_size
+        self._entries, self._size = len(entries), size
+
+    def _open(self, key: str) -> CachedAudio | None:
+        try:
+            audio_file = open(self._path(key), "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(audio_file.fileno())
+            return CachedAudio(audio_file, os.fstat(audio_file.fileno()).st_size)
+        except OSError:
+            audio_file.close()
+            raise
+
+    async def lookup(self, key: str) -> CachedAudio | None:
+        """Open the cached file for key, counting the hit or miss."""
+        try:
+            cached = await asyncio.to_thread(self._open, key)
+        except OSError:
+            logger.exception("Failed to open cached audio %s", key)
+            cached = None
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_saved += cached.size
+        return cached
+
+    def _commit(self, key: str, parts: list[bytes]) -> None:
+        tmp_path = self._dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as tmp:
+                tmp.writelines(parts)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self._evict()
+
+    async def tee(
+        self, chunks: AsyncIterator[bytes], key: Callable[[], str | None]
+    ) -> AsyncIterator[bytes]:
+        """Relay chunks unchanged, caching them once complete.
+
+        key is asked for once the stream has ended, so the producer can say
+        what the audio turned out to be; None skips caching. The file is
+        written off the event loop in one go, and audio larger than the
+        whole cache is not kept.
+        """
+        parts: list[bytes] = []
+        size = 0
+        async for chunk in chunks:
+            if size <= self._max_bytes:
+                parts.append(chunk)
+            size += len(chunk)
+            yield chunk
+        if not size or size > self._max_bytes:
+            return
+        final_key = key()
+        if final_key is None:
+            return
+        try:
+            await asyncio.to_thread(self._commit, final_key, parts)
+        except OSError:
+            logger.exception("Failed to cache audio %s", final_key)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+def _create_audio_cache() -> AudioCache | None:
+    if not settings.audio_cache_enabled:
+        return None
+    directory = settings.audio_cache_dir or os.path.join(tempfile.gettempdir(), "curiocity-audio")
+    try:
+        return AudioCache(directory, settings.audio_cache_max_bytes)
+    except OSError:
+        logger.exception("Audio cache directory unavailable; caching disabled")
+        return None
+
+
+audio_cache = _create_audio_cache()
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from app.config import settings
+from app.models.schemas import IdentifyResponse
+from app.prompts.identify_prompt import PROMPT_VERSION
+from app.services.character_pack import CharacterPack, open_pack
+
+logger = logging.getLogger(__name__)
+
+# A loader returns the built character and whether it is complete (no stage
+# fell back). Degraded results are served but never cached.
+CharacterLoader = Callable[[], Awaitable[tuple[IdentifyResponse, bool]]]
+
+
+def normalize_entity(entity: str) -> str:
+    """Canonical form of an entity name: casefolded, trimmed, single-spaced."""
+    cleaned = entity.strip().strip("\"'.!?").strip()
+    return re.sub(r"\s+", " ", cleaned).casefold()
+
+
+def character_key(entity: str) -> str:
+    """Content address of a character: entity + model + prompt version."""
+    material = "\0".join([normalize_entity(entity), settings.gemini_model, PROMPT_VERSION])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed second tier, shared across workers and restarts."""
+
+    def __init__(self, path: str, max_entries: int):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS characters ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> tuple[float, str] | None:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM characters WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM characters WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE characters SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return expires_at, payload
+
+    def put(self, key: str, payload: str, expires_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO characters VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM characters WHERE key IN ("
+                " SELECT key FROM characters ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM characters WHERE key = ?", (key,))
+
+
+class CharacterCache:
+    """Two-tier TTL/LRU cache of finished characters with single-flight misses.
+
+    A precomputed character pack, when loaded, is consulted between the
+    memory and disk tiers; its entries never expire.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        db_path: str = "",
+        disk_max_entries: int = 0,
+        pack: CharacterPack | None = None,
+    ):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, IdentifyResponse]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[IdentifyResponse]] = {}
+        self._disk = _DiskTier(db_path, disk_max_entries or max_entries * 8) if db_path else None
+        self.pack = pack
+        self.hits = 0
+        self.pack_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared_misses = 0
+
+    def _get_memory(self, key: str) -> IdentifyResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: IdentifyResponse, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> IdentifyResponse | None:
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.pack is not None:
+            value = self.pack.get(key)
+            if value is not None:
+                self._put_memory(key, value, time.time() + self._ttl)
+                self.pack_hits += 1
+                return value
+        if self._disk is None:
+            return None
+        try:
+            row = await asyncio.to_thread(self._disk.get, key)
+        except sqlite3.Error:
+            logger.exception("Character cache disk read failed")
+            return None
+        if row is None:
+            return None
+        expires_at, payload = row
+        value = IdentifyResponse.model_validate_json(payload)
+        self._put_memory(key, value, expires_at)
+        self.disk_hits += 1
+        return value
+
+    async def put(self, key: str, value: IdentifyResponse) -> None:
+        expires_at = time.time() + self._ttl
+        self._put_memory(key, value, expires_at)
+        if self._disk is None:
+            return
+        try:
+            await asyncio.to_thread(self._disk.put, key, value.model_dump_json(), expires_at)
+        except sqlite3.Error:
+            logger.exception("Character cache disk write failed")
+
+    async def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._disk is None:
+            return
+        try:
+            await asyncio.to_thread(self._disk.delete, key)
+        except sqlite3.Error:
+            logger.exception("Character cache disk delete failed")
+
+    async def _load(self, key: str, loader: CharacterLoader) -> IdentifyResponse:
+        try:
+            value, complete = await loader()
+            if complete:
+                await self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_create(self, entity: str, loader: CharacterLoader) -> IdentifyResponse:
+        """Return the cached character for entity, building it at most once concurrently."""
+        key = character_key(entity)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        # The build runs as its own task so one caller disconnecting does not
+        # cancel the pipeline for everyone else waiting on the same entity.
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+        else:
+            self.shared_misses += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "pack_entries": len(self.pack) if self.pack is not None else 0,
+            "pack_hits": self.pack_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "shared_misses": self.shared_misses,
+        }
+
+
+character_cache = CharacterCache(
+    max_entries=settings.character_cache_max_entries,
+    ttl_seconds=settings.character_cache_ttl_seconds,
+    db_path=settings.character_cache_db_path,
+    disk_max_entries=settings.character_cache_disk_max_entries,
+    pack=open_pack(settings.character_pack_path, settings.gemini_model, PROMPT_VERSION),
+)
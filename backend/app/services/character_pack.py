@@ -0,0 +1,133 @@
+import logging
+import mmap
+import os
+import struct
+from typing import Iterator
+
+from app.models.schemas import IdentifyResponse
+
+logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b"CCPK"
+PACK_VERSION = 2
+# magic, format version, reserved, entry count, then the lengths of the
+# UTF-8 Gemini model and prompt version that follow the header
+_HEADER = struct.Struct("<4sHHIHH")
+# sha256 character key, blob offset, blob length; sorted by key
+_INDEX_ENTRY = struct.Struct("<32sQI")
+_KEY_SIZE = 32
+
+
+def write_pack(
+    path: str, characters: dict[str, IdentifyResponse], model: str, prompt_version: str
+) -> int:
+    """Write characters, keyed by character_key, as a pack; returns its size.
+
+    Layout: header, the model and prompt version the characters were built
+    with, a sorted fixed-width key index, then one JSON blob per character.
+    The file is replaced atomically, so a server that has the old pack
+    mapped keeps reading it until it restarts.
+    """
+    build = (model.encode(), prompt_version.encode())
+    keys = sorted(characters)
+    blobs = [characters[key].model_dump_json(exclude={"session_id"}).encode() for key in keys]
+    offset = _HEADER.size + sum(map(len, build)) + _INDEX_ENTRY.size * len(keys)
+    index = bytearray()
+    for key, blob in zip(keys, blobs):
+        index += _INDEX_ENTRY.pack(bytes.fromhex(key), offset, len(blob))
+        offset += len(blob)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as pack_file:
+        pack_file.write(
+            _HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(keys), *map(len, build))
+        )
+        pack_file.write(b"".join(build))
+        pack_file.write(index)
+        for blob in blobs:
+            pack_file.write(blob)
+    os.replace(temp_path, path)
+    return offset
+
+
+class CharacterPack:
+    """Read-only characters built ahead of time by app.warmup, memory-mapped.
+
+    Lookups binary-search the key index in place and parse only the matching
+    blob, so opening a pack costs nothing per entry and its pages are shared
+    between workers through the page cache.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as pack_file:
+            self._map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} is too short to be a character pack")
+        magic, version, _, count, model_size, prompt_size = _HEADER.unpack_from(self._map)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is not a character pack")
+        if version != PACK_VERSION:
+            raise ValueError(f"{path} is pack version {version}, expected {PACK_VERSION}")
+        self._index_start = _HEADER.size + model_size + prompt_size
+        if self._index_start + count * _INDEX_ENTRY.size > len(self._map):
+            raise ValueError(f"{path} is truncated")
+        self.model = self._map[_HEADER.size : _HEADER.size + model_size].decode()
+        self.prompt_version = self._map[_HEADER.size + model_size : self._index_start].decode()
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key_at(self, position: int) -> bytes:
+        start = self._index_start + position * _INDEX_ENTRY.size
+        return self._map[start : start + _KEY_SIZE]
+
+    def _load(self, position: int) -> IdentifyResponse:
+        _, offset, length = _INDEX_ENTRY.unpack_from(
+            self._map, self._index_start + position * _INDEX_ENTRY.size
+        )
+        return IdentifyResponse.model_validate_json(self._map[offset : offset + length])
+
+    def get(self, key: str) -> IdentifyResponse | None:
+        target = bytes.fromhex(key)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._count or self._key_at(low) != target:
+            return None
+        return self._load(low)
+
+    def items(self) -> Iterator[tuple[str, IdentifyResponse]]:
+        for position in range(self._count):
+            yield self._key_at(position).hex(), self._load(position)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def open_pack(path: str, model: str, prompt_version: str) -> CharacterPack | None:
+    """The pack at path, or None when unset, missing, unreadable or built with
+    another model or prompt version (none of its characters could match)."""
+    if not path:
+        return None
+    try:
+        pack = CharacterPack(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("Character pack not loaded: %s", exc)
+        return None
+    if (pack.model, pack.prompt_version) != (model, prompt_version):
+        logger.warning(
+            "Character pack %s not loaded: built for %s prompt v%s, not %s prompt v%s",
+            path,
+            pack.model,
+            pack.prompt_version,
+            model,
+            prompt_version,
+        )
+        pack.close()
+        return None
+    logger.info("Loaded character pack %s with %d characters", path, len(pack))
+    return pack
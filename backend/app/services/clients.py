@@ -0,0 +1,90 @@
+import logging
+
+import httpx
+from deepgram import DeepgramClient, DeepgramClientOptions
+from google import genai
+from google.genai import types
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_http_client(**overrides) -> httpx.AsyncClient:
+    """Keep-alive, HTTP/2-capable pool configured from settings."""
+    options = {
+        "http2": settings.http2_enabled,
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+    }
+    options.update(overrides)
+    return httpx.AsyncClient(**options)
+
+
+class ClientRegistry:
+    """Long-lived upstream clients shared by every request on this worker.
+
+    The FastAPI lifespan calls start() and close(). Each getter also creates
+    its client on first use, so scripts and serverless runtimes that skip the
+    lifespan still share one pool per process.
+    """
+
+    def __init__(self) -> None:
+        self._http: httpx.AsyncClient | None = None
+        self._genai: genai.Client | None = None
+        self._genai_http: httpx.AsyncClient | None = None
+        self._deepgram: DeepgramClient | None = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = build_http_client()
+        return self._http
+
+    @property
+    def genai(self) -> genai.Client:
+        if self._genai is None:
+            # Gemini gets a pool of its own, built here so close() can release
+            # it; the SDK leaves a client it was handed for its owner to close.
+            self._genai_http = build_http_client()
+            http_options = types.HttpOptions(
+                base_url=settings.gemini_base_url or None,
+                httpx_async_client=self._genai_http,
+            )
+            self._genai = genai.Client(api_key=settings.gemini_api_key, http_options=http_options)
+        return self._genai
+
+    @property
+    def deepgram(self) -> DeepgramClient:
+        if self._deepgram is None:
+            config = None
+            if settings.deepgram_base_url:
+                config = DeepgramClientOptions(url=settings.deepgram_base_url)
+            self._deepgram = DeepgramClient(settings.deepgram_api_key, config)
+        return self._deepgram
+
+    async def start(self) -> None:
+        """Open pools up front so the first request does not pay for them."""
+        _ = self.http
+        # The SDK constructors reject empty keys; leave those to fail per call.
+        if settings.gemini_api_key:
+            _ = self.genai
+        if settings.deepgram_api_key:
+            _ = self.deepgram
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self._genai = None
+        if self._genai_http is not None:
+            await self._genai_http.aclose()
+            self._genai_http = None
+        self._deepgram = None
+
+
+clients = ClientRegistry()
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from app.config import settings
+from app.services.history import estimate_tokens
+from app.services.metrics import upstream_span
+from app.services.scheduler import Priority, gemini_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Stop using a cache this long before Gemini expires it, so no request is
+# sent with a name that disappears while it is in flight.
+_EXPIRY_MARGIN_SECONDS = 60.0
+# After a failed create (quota, unsupported model, ...) send the plain system
+# instruction for this long before trying again.
+_FAILURE_BACKOFF_SECONDS = 600.0
+
+
+def rejects_cached_content(exc: BaseException) -> bool:
+    """Whether exc is Gemini refusing the cached content itself (expired,
+    deleted or invalid), the one failure a retry with the inline prompt fixes."""
+    if not isinstance(exc, genai_errors.ClientError) or exc.code not in (400, 403, 404):
+        return False
+    return "cachedcontent" in (exc.message or "").replace(" ", "").lower()
+
+
+class _Entry(NamedTuple):
+    name: str
+    expires_at: float
+    client: genai.Client
+
+
+class ContextCache:
+    """Gemini cached contents for chat system prompts, keyed by prompt hash.
+
+    A prompt's cache is created in the background on its first chat turn,
+    which itself still sends the system instruction, and is then reused by
+    every later turn and session rendering the same profile. Entries expire
+    on Gemini's side after ttl seconds; the local map drops them a little
+    earlier, and LRU-evicted entries are deleted upstream. Prompts below the
+    model's minimum cacheable size are never cached.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, min_tokens: int, max_entries: int):
+        self._enabled = enabled
+        self._ttl = ttl_seconds
+        self._min_tokens = min_tokens
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._failed_until: dict[str, float] = {}
+        self._creating: dict[str, asyncio.Task] = {}
+        self._deleting: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.failures = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def _key(model: str, system_prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{system_prompt}".encode()).hexdigest()
+
+    def lookup(self, client: genai.Client, model: str, system_prompt: str) -> str | None:
+        """Cached content name for the prompt, or None to send it inline.
+
+        A miss starts creating the cache for later turns without waiting.
+        """
+        if not self._enabled or estimate_tokens(system_prompt) < self._min_tokens:
+            return None
+        key = self._key(model, system_prompt)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.name
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        if self._failed_until.get(key, 0.0) <= now and key not in self._creating:
+            task = asyncio.create_task(self._create(key, client, model, system_prompt))
+            self._creating[key] = task
+            task.add_done_callback(lambda _: self._creating.pop(key, None))
+        return None
+
+    async def _create(self, key: str, client: genai.Client, model: str, system_prompt: str) -> None:
+        try:
+            cached = await gemini_scheduler.call(
+                Priority.BACKGROUND,
+                lambda: self._create_upstream(client, model, system_prompt),
+            )
+        except Exception as exc:
+            self.failures += 1
+            self._failed_until[key] = time.monotonic() + _FAILURE_BACKOFF_SECONDS
+            logger.warning("Context cache create failed; sending prompts inline: %s", exc)
+            return
+        self.created += 1
+        self._failed_until.pop(key, None)
+        expires_at = time.monotonic() + self._ttl - _EXPIRY_MARGIN_SECONDS
+        self._entries[key] = _Entry(cached.name, expires_at, client)
+        self._evict()
+
+    async def _create_upstream(self, client: genai.Client, model: str, system_prompt: str) -> Any:
+        with upstream_span("gemini", "cache_create"):
+            return await client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    ttl=f"{int(self._ttl)}s",
+                ),
+            )
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+        for key in [key for key, until in self._failed_until.items() if until <= now]:
+            del self._failed_until[key]
+        while len(self._entries) > self._max_entries:
+            _, entry = self._entries.popitem(last=False)
+            task = asyncio.create_task(self._delete(entry))
+            self._deleting.add(task)
+            task.add_done_callback(self._deleting.discard)
+
+    @staticmethod
+    async def _delete(entry: _Entry) -> None:
+        try:
+            await gemini_scheduler.call(
+                Priority.BACKGROUND, lambda: entry.client.aio.caches.delete(name=entry.name)
+            )
+        except Exception:
+            # It still expires on its own when its TTL runs out.
+            logger.warning("Failed to delete evicted context cache %s", entry.name)
+
+    def invalidate(self, model: str, system_prompt: str) -> None:
+        """Forget a cache Gemini no longer recognises; the next miss recreates it."""
+        self._entries.pop(self._key(model, system_prompt), None)
+
+    def record_usage(self, usage_metadata: Any) -> None:
+        if usage_metadata is None:
+            return
+        saved = usage_metadata.cached_content_token_count or 0
+        self.tokens_saved += saved
+        if saved:
+            logger.debug(
+                "context cache saved %d of %d prompt tokens",
+                saved,
+                usage_metadata.prompt_token_count or 0,
+            )
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "created": self.created,
+            "failures": self.failures,
+            "prompt_tokens_saved": self.tokens_saved,
+        }
+
+
+context_cache = ContextCache(
+    enabled=settings.context_cache_enabled,
+    ttl_seconds=settings.context_cache_ttl_seconds,
+    min_tokens=settings.context_cache_min_tokens,
+    max_entries=settings.context_cache_max_entries,
+)
@@ -0,0 +1,77 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """End-to-end time limit of one request, shared out between its stages.
+
+    A stage's budget is a share of whatever time is left when it starts, so
+    a slow early stage shrinks the later ones instead of overrunning the
+    request; a stage left with nothing falls back straight away.
+    """
+
+    def __init__(self, seconds: float):
+        self._expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def budget(self, share: float = 1.0, cap: float | None = None) -> float:
+        """Seconds a stage may use: share of the remaining time, at most cap."""
+        budget = self.remaining() * share
+        return budget if cap is None else min(budget, cap)
+
+
+class LatencyWindow:
+    """The most recent latencies of one call, for percentile lookups."""
+
+    def __init__(self, size: int):
+        self._recent: deque[float] = deque(maxlen=size)
+        self._sorted: list[float] = []
+
+    def record(self, seconds: float) -> None:
+        if len(self._recent) == self._recent.maxlen:
+            del self._sorted[bisect.bisect_left(self._sorted, self._recent[0])]
+        self._recent.append(seconds)
+        bisect.insort(self._sorted, seconds)
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def percentile(self, fraction: float) -> float | None:
+        if not self._sorted:
+            return None
+        return self._sorted[min(len(self._sorted) - 1, int(fraction * len(self._sorted)))]
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float | None) -> tuple[T, str]:
+    """Run call(); if it is still running after delay seconds, race a copy.
+
+    Returns the first successful result and which attempt produced it:
+    "unhedged" when no copy was started, else "primary" or "hedge". The
+    other attempt is cancelled; this fails only when both attempts fail.
+    """
+    if delay is None:
+        return await call(), "unhedged"
+    primary = asyncio.ensure_future(call())
+    attempts = {primary: "unhedged"}
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if not done:
+            attempts = {primary: "primary", asyncio.ensure_future(call()): "hedge"}
+        pending = set(attempts)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), attempts[task]
+            if not pending:
+                raise done.pop().exception()
+    finally:
+        for task in attempts:
+            task.cancel()
@@ -1,20 +1,49 @@
-from deepgram import DeepgramClient, PrerecordedOptions
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable
+
+from deepgram import LiveOptions, LiveTranscriptionEvents, PrerecordedOptions
 
-from app.config import settings
 from app.models.schemas import SpeechToTextResponse
+from app.services.clients import clients
+from app.services.metrics import upstream_span
+from app.services.scheduler import Priority, deepgram_scheduler
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIBE_MODEL = "nova-2"
+# After Finalize, how long to wait for Deepgram's flushed last result.
+_FINALIZE_TIMEOUT_SECONDS = 3.0
+
+# Receives JSON-ready transcript events from a live transcription.
+TranscriptListener = Callable[[dict], Awaitable[None]]
+AudioSender = Callable[[bytes], Awaitable[bool]]
+
+_closing: set[asyncio.Task] = set()
 
 
-async def transcribe(audio_bytes: bytes) -> SpeechToTextResponse:
-    client = DeepgramClient(settings.deepgram_api_key)
+async def transcribe(audio: bytes | AsyncIterable[bytes]) -> SpeechToTextResponse:
+    """Transcribe a recording; an async iterable is streamed to Deepgram as it is read."""
+    client = clients.deepgram
 
-    payload = {"buffer": audio_bytes}
+    payload: Any = {"buffer": audio} if isinstance(audio, bytes) else {"stream": audio}
     options = PrerecordedOptions(
-        model="nova-2",
+        model=TRANSCRIBE_MODEL,
         smart_format=True,
         profanity_filter=True,
     )
 
-    response = client.listen.rest.v("1").transcribe_file(payload, options)
+    async def request() -> Any:
+        with upstream_span("deepgram", "transcribe"):
+            return await client.listen.asyncrest.v("1").transcribe_file(payload, options)
+
+    if isinstance(audio, bytes):
+        response = await deepgram_scheduler.call(Priority.INTERACTIVE, request)
+    else:
+        # An upload stream can only be read once, so it is never retried.
+        async with deepgram_scheduler.slot(Priority.INTERACTIVE):
+            response = await request()
     channel = response.results.channels[0]
     alternative = channel.alternatives[0]
 
@@ -22,3 +51,72 @@ async def transcribe(audio_bytes: bytes) -> SpeechToTextResponse:
         transcript=alternative.transcript,
         confidence=alternative.confidence,
     )
+
+
+@asynccontextmanager
+async def live_transcription(
+    on_event: TranscriptListener,
+    encoding: str | None = None,
+    sample_rate: int | None = None,
+) -> AsyncIterator[AudioSender]:
+    """Deepgram streaming session; yields a coroutine function sending audio.
+
+    Transcripts are relayed to on_event as they arrive, interim ones
+    included. Leaving the block normally flushes Deepgram's buffer first, so
+    the final words of the utterance are not lost, then sends {"type": "done"}.
+    """
+    connection = clients.deepgram.listen.asyncwebsocket.v("1")
+    flushed = asyncio.Event()
+
+    async def on_transcript(_connection: Any, result: Any, **kwargs: Any) -> None:
+        if result.from_finalize:
+            flushed.set()
+        alternative = result.channel.alternatives[0]
+        if alternative.transcript:
+            await on_event(
+                {
+                    "type": "transcript",
+                    "transcript": alternative.transcript,
+                    "confidence": alternative.confidence,
+                    "is_final": bool(result.is_final),
+                    "speech_final": bool(result.speech_final),
+                }
+            )
+
+    async def on_utterance_end(_connection: Any, utterance_end: Any, **kwargs: Any) -> None:
+        await on_event({"type": "utterance_end"})
+
+    async def on_error(_connection: Any, error: Any, **kwargs: Any) -> None:
+        logger.error("Deepgram live transcription error: %s", error)
+        await on_event({"type": "error"})
+
+    connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
+    connection.on(LiveTranscriptionEvents.UtteranceEnd, on_utterance_end)
+    connection.on(LiveTranscriptionEvents.Error, on_error)
+
+    options = LiveOptions(
+        model=TRANSCRIBE_MODEL,
+        smart_format=True,
+        profanity_filter=True,
+        interim_results=True,
+        utterance_end_ms="1000",
+        vad_events=True,
+        encoding=encoding,
+        sample_rate=sample_rate,
+    )
+    with upstream_span("deepgram", "live_connect"):
+        started = await connection.start(options)
+    if not started:
+        raise ConnectionError("Could not start Deepgram live transcription")
+    try:
+        yield connection.send
+        if await connection.finalize():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(flushed.wait(), _FINALIZE_TIMEOUT_SECONDS)
+        await on_event({"type": "done"})
+    finally:
+        # finish() takes around half a second to wind down the SDK's tasks;
+        # nothing downstream needs to wait for it.
+        task = asyncio.create_task(connection.finish())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
@@ -1,11 +1,60 @@
-import io
-import re
+import asyncio
+import hashlib
+import json
+from functools import partial
+from typing import Any, AsyncGenerator, AsyncIterator, Callable
 
 import httpx
 
 from app.config import settings
+from app.services.audio_cache import CachedAudio, audio_cache
+from app.services.clients import clients
+from app.services.metrics import FALLBACKS, PAYLOAD_BYTES, upstream_span
+from app.services.scheduler import Priority, elevenlabs_scheduler
+from app.services.voice_catalog import VoiceCatalog
+from app.services.voice_registry import voice_registry
 
-ELEVENLABS_BASE = "https://api.elevenlabs.io/v1"
+ELEVENLABS_BASE = settings.elevenlabs_base_url.rstrip("/")
+TTS_MODEL_ID = "eleven_turbo_v2"
+TTS_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.75}
+
+
+def _speech_request(text: str) -> dict:
+    return {
+        "headers": {
+            "xi-api-key": settings.elevenlabs_api_key,
+            "Content-Type": "application/json",
+        },
+        "json": {
+            "text": text,
+            "model_id": TTS_MODEL_ID,
+            "voice_settings": TTS_VOICE_SETTINGS,
+        },
+    }
+
+
+def speech_cache_key(text: str, voice_id: str) -> str:
+    """Hash of every input that determines the synthesized audio."""
+    material = json.dumps(
+        [voice_id, text, TTS_MODEL_ID, TTS_VOICE_SETTINGS], sort_keys=True
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+async def cached_speech(text: str, voice_id: str | None) -> CachedAudio | None:
+    """Previously synthesized audio for this text and requested voice, if cached."""
+    if audio_cache is None:
+        return None
+    return await audio_cache.lookup(speech_cache_key(text, voice_id or settings.elevenlabs_voice_id))
+
+
+def _speech_voices(voice_id: str | None) -> list[str]:
+    """Requested voice first, then the default, without duplicates or blanks."""
+    voices: list[str] = []
+    for vid in (voice_id, settings.elevenlabs_voice_id):
+        if vid and vid not in voices:
+            voices.append(vid)
+    return voices
 
 
 def _normalize_preview_text(preview_text: str | None) -> str:
@@ -18,139 +67,197 @@ def _normalize_preview_text(preview_text: str | None) -> str:
     return base[:1000]
 
 
-def _tokenize(text: str) -> set[str]:
-    return set(re.findall(r"[a-z]{3,}", (text or "").lower()))
-
-
-def _score_voice(voice: dict, voice_description: str) -> int:
-    labels = voice.get("labels") or {}
-    blob = " ".join(
-        [
-            voice.get("name", ""),
-            voice.get("description", ""),
-            str(labels),
-            voice.get("category", ""),
-        ]
-    ).lower()
-
-    wanted = _tokenize(voice_description)
-    score = 0
-    for token in wanted:
-        if token in blob:
-            score += 2
-
-    # Strong boosts for key traits.
-    accent = str(labels.get("accent", "")).lower()
-    gender = str(labels.get("gender", "")).lower()
-    age = str(labels.get("age", "")).lower()
-    use_case = str(labels.get("use_case", "")).lower()
-    if "irish" in voice_description.lower() and "irish" in accent:
-        score += 20
-    if "male" in voice_description.lower() and "male" in gender:
-        score += 12
-    if "female" in voice_description.lower() and "female" in gender:
-        score += 12
-    if "older" in voice_description.lower() and ("old" in age or "middle" in age):
-        score += 6
-    if "story" in voice_description.lower() and ("narration" in use_case or "audiobook" in use_case):
-        score += 6
-    return score
+async def _request(
+    priority: Priority, operation: str, method: str, url: str, **kwargs: Any
+) -> httpx.Response:
+    """One ElevenLabs call through its scheduler, which retries 429s.
 
+    Any other status is returned for the caller to handle.
+    """
 
-async def _choose_best_existing_voice(voice_description: str) -> str:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{ELEVENLABS_BASE}/voices",
-            headers={"xi-api-key": settings.elevenlabs_api_key},
-            timeout=30.0,
-        )
-        if not response.is_success:
-            return settings.elevenlabs_voice_id
+    async def send() -> httpx.Response:
+        with upstream_span("elevenlabs", operation):
+            response = await clients.http.request(method, url, **kwargs)
+            if response.status_code == 429:
+                response.raise_for_status()
+        return response
+
+    return await elevenlabs_scheduler.call(priority, send)
+
+
+async def _fetch_voices() -> list[dict]:
+    response = await _request(
+        Priority.PIPELINE,
+        "list_voices",
+        "GET",
+        f"{ELEVENLABS_BASE}/voices",
+        headers={"xi-api-key": settings.elevenlabs_api_key},
+    )
+    response.raise_for_status()
+    return response.json().get("voices", [])
 
-        voices = response.json().get("voices", [])
-        if not voices:
-            return settings.elevenlabs_voice_id
 
-        best = max(voices, key=lambda v: _score_voice(v, voice_description))
-        return best.get("voice_id", settings.elevenlabs_voice_id)
+voice_catalog = VoiceCatalog(_fetch_voices, ttl_seconds=settings.voice_catalog_ttl_seconds)
+
+
+async def _choose_best_existing_voice(voice_description: str) -> str:
+    voice_id = await voice_catalog.choose(voice_description)
+    return voice_id or settings.elevenlabs_voice_id
+
 
+async def design_voice(voice_description: str, preview_text: str) -> str | None:
+    """Create a persistent ElevenLabs voice from description and return voice_id.
 
-async def design_voice(voice_description: str, preview_text: str) -> str:
-    """Create a persistent ElevenLabs voice from description and return voice_id."""
+    Returns None when the account's voice limit is reached.
+    """
     # Clamp voice_description to 20-1000 chars
     desc = voice_description[:1000]
     if len(desc) < 20:
         desc = desc + " " + "A friendly, expressive voice."
 
-    url = f"{ELEVENLABS_BASE}/text-to-voice/create-previews"
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            url,
-            headers={
-                "xi-api-key": settings.elevenlabs_api_key,
-                "Content-Type": "application/json",
-            },
-            json={
-                "voice_description": desc,
-                "text": _normalize_preview_text(preview_text),
-            },
-            timeout=30.0,
+    headers = {
+        "xi-api-key": settings.elevenlabs_api_key,
+        "Content-Type": "application/json",
+    }
+    response = await _request(
+        Priority.PIPELINE,
+        "create_previews",
+        "POST",
+        f"{ELEVENLABS_BASE}/text-to-voice/create-previews",
+        headers=headers,
+        json={
+            "voice_description": desc,
+            "text": _normalize_preview_text(preview_text),
+        },
+    )
+    response.raise_for_status()
+    data = response.json()
+    generated_voice_id = data["previews"][0]["generated_voice_id"]
+
+    finalize_response = await _request(
+        Priority.PIPELINE,
+        "create_voice",
+        "POST",
+        f"{ELEVENLABS_BASE}/text-to-voice/create-voice-from-preview",
+        headers=headers,
+        json={
+            "voice_name": f"curiocity-{generated_voice_id[:8]}",
+            "voice_description": desc,
+            "generated_voice_id": generated_voice_id,
+        },
+    )
+    if finalize_response.status_code == 400:
+        detail = finalize_response.json().get("detail", {})
+        if isinstance(detail, dict) and detail.get("status") == "voice_limit_reached":
+            return None
+    finalize_response.raise_for_status()
+    voice_data = finalize_response.json()
+    return voice_data["voice_id"]
+
+
+async def _design_and_register(voice_description: str, preview_text: str) -> str:
+    voice_id = await design_voice(voice_description, preview_text)
+    if voice_id is None:
+        # Not registered: similar characters should get a designed voice
+        # once the account has room again, not this stand-in.
+        FALLBACKS.labels("voice_limit_existing_voice").inc()
+        return await _choose_best_existing_voice(voice_description)
+    await voice_registry.register(voice_description, voice_id)
+    return voice_id
+
+
+async def voice_for_character(
+    voice_description: str, preview_text: str
+) -> tuple[str, asyncio.Task[str] | None]:
+    """Voice for a new character: reuse a close existing one, else design one.
+
+    Returns (voice_id, pending). In VOICE_DESIGN_MODE=async a missing voice is
+    designed in the background: voice_id is the default voice and pending is
+    the task that resolves to the designed voice.
+    """
+    if settings.voice_reuse_enabled:
+        reused = voice_registry.match(voice_description)
+        if reused is not None:
+            return reused, None
+    if settings.voice_design_mode == "async":
+        task = asyncio.create_task(_design_and_register(voice_description, preview_text))
+        return settings.elevenlabs_voice_id, task
+    return await _design_and_register(voice_description, preview_text), None
+
+
+async def _open_speech_stream(text: str, vid: str) -> AsyncGenerator[bytes, None]:
+    url = f"{ELEVENLABS_BASE}/text-to-speech/{vid}/stream"
+    with upstream_span("elevenlabs", "tts_stream") as span:
+        async with clients.http.stream("POST", url, **_speech_request(text)) as response:
+            if not response.is_success:
+                await response.aread()
+                response.raise_for_status()
+            size = 0
+            async for chunk in response.aiter_bytes():
+                span.first_chunk()
+                size += len(chunk)
+                yield chunk
+            PAYLOAD_BYTES.labels("tts_audio").observe(size)
+
+
+async def _stream_speech_chunks(
+    text: str, voice_id: str | None, on_voice: Callable[[str], None] | None = None
+) -> AsyncIterator[bytes]:
+    """MP3 chunks from the first voice that answers; on_voice gets its id."""
+    voices = _speech_voices(voice_id)
+    for attempt, vid in enumerate(voices):
+        if attempt:
+            FALLBACKS.labels("tts_default_voice").inc()
+        chunks = elevenlabs_scheduler.stream(
+            Priority.INTERACTIVE, partial(_open_speech_stream, text, vid)
         )
-        response.raise_for_status()
-        data = response.json()
-        generated_voice_id = data["previews"][0]["generated_voice_id"]
-
-        finalize_response = await client.post(
-            f"{ELEVENLABS_BASE}/text-to-voice/create-voice-from-preview",
-            headers={
-                "xi-api-key": settings.elevenlabs_api_key,
-                "Content-Type": "application/json",
-            },
-            json={
-                "voice_name": f"curiocity-{generated_voice_id[:8]}",
-                "voice_description": desc,
-                "generated_voice_id": generated_voice_id,
-            },
-            timeout=30.0,
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            return
+        except httpx.HTTPStatusError:
+            if attempt == len(voices) - 1:
+                raise
+            # Nothing has been sent yet, so the next voice can still take over.
+            continue
+        if on_voice is not None:
+            on_voice(vid)
+        yield first
+        async for chunk in chunks:
+            yield chunk
+        return
+
+
+async def stream_speech(
+    text: str, voice_id: str | None = None, check_cache: bool = True
+) -> AsyncIterator[bytes]:
+    """Open a streaming synthesis and return its MP3 chunks as they arrive.
+
+    Cached audio is replayed from disk. Otherwise the first chunk is awaited
+    here, so voice fallback and upstream errors surface before the caller has
+    committed to a response.
+    """
+    cached = await cached_speech(text, voice_id) if check_cache else None
+    if cached is not None:
+        return cached.chunks()
+
+    spoken_by: list[str] = []
+    chunks = _stream_speech_chunks(text, voice_id, spoken_by.append)
+    if audio_cache is not None:
+        # Cached under the voice that actually spoke, so a fallback to the
+        # default voice never answers later lookups for the requested one.
+        chunks = audio_cache.tee(
+            chunks, lambda: speech_cache_key(text, spoken_by[0]) if spoken_by else None
         )
-        if finalize_response.status_code == 400:
-            detail = finalize_response.json().get("detail", {})
-            if isinstance(detail, dict) and detail.get("status") == "voice_limit_reached":
-                return await _choose_best_existing_voice(desc)
-        finalize_response.raise_for_status()
-        voice_data = finalize_response.json()
-        return voice_data["voice_id"]
-
-
-async def generate_speech(text: str, voice_id: str | None = None) -> io.BytesIO:
-    """Generate speech using voice_id and retry with default voice if needed."""
-    voices = [voice_id, settings.elevenlabs_voice_id]
-    tried: set[str] = set()
-
-    async with httpx.AsyncClient() as client:
-        for vid in voices:
-            if not vid or vid in tried:
-                continue
-            tried.add(vid)
-            url = f"{ELEVENLABS_BASE}/text-to-speech/{vid}"
-            response = await client.post(
-                url,
-                headers={
-                    "xi-api-key": settings.elevenlabs_api_key,
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "text": text,
-                    "model_id": "eleven_turbo_v2",
-                    "voice_settings": {
-                        "stability": 0.5,
-                        "similarity_boost": 0.75,
-                    },
-                },
-                timeout=30.0,
-            )
-            if response.is_success:
-                return io.BytesIO(response.content)
-
-        response.raise_for_status()
-        return io.BytesIO(response.content)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def relay() -> AsyncIterator[bytes]:
+        if first:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return relay()
@@ -1,26 +1,101 @@
+import asyncio
 import base64
 import json
 import logging
-from typing import Any
+import re
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, BinaryIO, Callable, Coroutine
 
 from google import genai
 from google.genai import types
 
 from app.config import settings
-from app.models.schemas import IdentifyResponse, CharacterProfile, ConversationMessage
+from app.models.schemas import ChatSession, IdentifyResponse, CharacterProfile, ConversationMessage
 from app.prompts.identify_prompt import (
     IDENTIFY_PROMPT,
     RESEARCH_PROMPT_TEMPLATE,
     CHARACTER_CREATION_PROMPT_TEMPLATE,
 )
-from app.prompts.chat_prompt import CHAT_SYSTEM_PROMPT_TEMPLATE
-from app.services.elevenlabs_service import design_voice
+from app.prompts.chat_prompt import (
+    CHAT_SYSTEM_PROMPT_TEMPLATE,
+    CHAT_SUMMARY_CONTEXT_TEMPLATE,
+    CHAT_SUMMARY_PROMPT_TEMPLATE,
+)
+from app.services.character_cache import character_cache, character_key
+from app.services.clients import clients
+from app.services.context_cache import context_cache, rejects_cached_content
+from app.services.history import conversation_seed, history_manager
+from app.services.elevenlabs_service import voice_for_character
+from app.services.image_index import image_index
+from app.services.image_service import prepare_image
+from app.services.deadlines import Deadline, LatencyWindow, hedged
+from app.services.metrics import FALLBACKS, HEDGES, upstream_span
+from app.services.pipeline import Stage, StageContext, run_stages
+from app.services.scheduler import Priority, gemini_scheduler
 
 logger = logging.getLogger(__name__)
 
+UNKNOWN_ENTITY = "Unknown Object"
+
+_background_tasks: set[asyncio.Task] = set()
+
+# Receives (stage name, JSON-ready payload) as the identify pipeline progresses.
+PipelineListener = Callable[[str, dict], Awaitable[None]]
+
+# Share of the identify deadline still left that each step may use; voice
+# design, which starts last, gets whatever remains.
+_VISION_BUDGET_SHARE = 0.3
+_RESEARCH_BUDGET_SHARE = 0.5
+_CHARACTER_BUDGET_SHARE = 0.7
+# Vision calls observed before hedging starts, so its p95 means something.
+_HEDGE_MIN_SAMPLES = 20
+_identify_latency = LatencyWindow(size=200)
+
+# Chat turns go ahead of identify work; summaries only fill spare capacity.
+_OPERATION_PRIORITY = {
+    "chat": Priority.INTERACTIVE,
+    "chat_stream": Priority.INTERACTIVE,
+    "summary": Priority.BACKGROUND,
+}
+
 
 def _get_client() -> genai.Client:
-    return genai.Client(api_key=settings.gemini_api_key)
+    return clients.genai
+
+
+async def _generate_content(
+    client: genai.Client,
+    operation: str,
+    on_dispatch: Callable[[], None] | None = None,
+    **kwargs: Any,
+) -> Any:
+    """Run generate_content through the Gemini scheduler, timing each attempt.
+
+    on_dispatch is called as each attempt leaves the queue.
+    """
+
+    async def request() -> Any:
+        if on_dispatch is not None:
+            on_dispatch()
+        with upstream_span("gemini", operation):
+            return await client.aio.models.generate_content(**kwargs)
+
+    priority = _OPERATION_PRIORITY.get(operation, Priority.PIPELINE)
+    return await gemini_scheduler.call(priority, request)
+
+
+def _stream_content(client: genai.Client, operation: str, **kwargs: Any) -> AsyncIterator[Any]:
+    """generate_content_stream through the scheduler, timed as one upstream call."""
+
+    async def open_stream() -> AsyncGenerator[Any, None]:
+        with upstream_span("gemini", operation) as span:
+            stream = await client.aio.models.generate_content_stream(**kwargs)
+            async for chunk in stream:
+                span.first_chunk()
+                yield chunk
+
+    priority = _OPERATION_PRIORITY.get(operation, Priority.PIPELINE)
+    return gemini_scheduler.stream(priority, open_stream)
 
 
 def _decode_data_uri(data_uri: str) -> tuple[str, bytes]:
@@ -30,19 +105,22 @@ def _decode_data_uri(data_uri: str) -> tuple[str, bytes]:
     return mime_type, base64.b64decode(b64_data)
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+
 def _parse_json_response(text: str) -> dict:
-    """Parse JSON from Gemini response, stripping markdown fences if present."""
-    raw = text.strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1].rsplit("```", 1)[0]
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        start = raw.find("{")
-        end = raw.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return json.loads(raw[start : end + 1])
-        raise
+    """The JSON object in Gemini output, decoded in a single pass.
+
+    Decoding starts at the first "{" and stops where that object ends, so
+    markdown fences and prose before or after it need no stripping. Output
+    that is truncated or malformed there raises rather than yielding some
+    nested object, so callers take their fallback path.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object in model output", text, 0)
+    value, _ = _JSON_DECODER.raw_decode(text, start)
+    return value
 
 
 def _google_search_tool_config() -> Any:
@@ -78,159 +156,407 @@ def _extract_grounded_urls(response: Any) -> list[str]:
     return deduped[:8]
 
 
-async def identify_research_and_create(image_data_uri: str) -> IdentifyResponse:
+async def identify_research_and_create(
+    image_data_uri: str, on_event: PipelineListener | None = None
+) -> IdentifyResponse:
     mime_type, image_bytes = _decode_data_uri(image_data_uri)
-    entity = await identify_entity_from_image(mime_type, image_bytes)
-    return await create_character_from_entity(entity)
+    return await identify_research_and_create_from_image(mime_type, image_bytes, on_event)
+
 
+async def identify_research_and_create_from_image(
+    mime_type: str, image: bytes | BinaryIO, on_event: PipelineListener | None = None
+) -> IdentifyResponse:
+    """Identify the photo's entity and build its character.
+
+    on_event, when given, receives each stage's result as soon as it is known:
+    "entity", "research", "character" (profile + greeting), then "voice".
+    """
+    deadline = Deadline(settings.identify_deadline_seconds)
+    prepared = await prepare_image(mime_type, image)
+    entity = None
+    if prepared.fingerprint is not None:
+        entity = image_index.lookup(prepared.fingerprint)
+    if entity is not None:
+        logger.info("identify entity=%s matched a near-duplicate image", entity)
+    else:
+        start = time.perf_counter()
+        entity = await identify_entity_from_image(prepared.mime_type, prepared.data, deadline)
+        logger.info(
+            "identify entity=%s image_bytes=%d elapsed_ms=%.0f",
+            entity,
+            len(prepared.data),
+            (time.perf_counter() - start) * 1000,
+        )
+        if prepared.fingerprint is not None and entity != UNKNOWN_ENTITY:
+            image_index.add(prepared.fingerprint, entity)
+    if on_event is not None:
+        await on_event("entity", {"entity": entity})
+    return await create_character_from_entity(entity, on_event, deadline)
 
-async def identify_entity_from_image(mime_type: str, image_bytes: bytes) -> str:
+
+def _hedge_delay() -> float | None:
+    """When to race a second vision call: once the first passes its p95."""
+    if not settings.identify_hedge_enabled or len(_identify_latency) < _HEDGE_MIN_SAMPLES:
+        return None
+    return _identify_latency.percentile(settings.identify_hedge_percentile)
+
+
+async def identify_entity_from_image(
+    mime_type: str, image_bytes: bytes, deadline: Deadline | None = None
+) -> str:
     client = _get_client()
-    entity = "Unknown Object"
-    try:
-        identify_response = client.models.generate_content(
-            model=settings.gemini_model,
-            contents=[
-                {
-                    "role": "user",
-                    "parts": [
-                        {"text": IDENTIFY_PROMPT},
-                        {
-                            "inline_data": {
-                                "mime_type": mime_type,
-                                "data": base64.b64encode(image_bytes).decode(),
-                            }
-                        },
-                    ],
-                }
+    entity = UNKNOWN_ENTITY
+    contents = [
+        {
+            "role": "user",
+            "parts": [
+                types.Part.from_text(text=IDENTIFY_PROMPT),
+                types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
             ],
+        }
+    ]
+
+    first_attempt = iter((True,))
+
+    async def attempt() -> Any:
+        primary = next(first_attempt, False)
+        started: float | None = None
+
+        def dispatched() -> None:
+            nonlocal started
+            started = time.perf_counter()
+
+        try:
+            return await _generate_content(
+                client,
+                "identify",
+                on_dispatch=dispatched,
+                model=settings.gemini_model,
+                contents=contents,
+            )
+        finally:
+            # Only the primary call is timed, from when it left the queue to
+            # when it finished or was cancelled by a winning hedge or the
+            # budget, so slow calls stay in the window that sets the delay.
+            if primary and started is not None:
+                _identify_latency.record(time.perf_counter() - started)
+
+    budget = deadline.budget(_VISION_BUDGET_SHARE) if deadline is not None else None
+    try:
+        identify_response, winner = await asyncio.wait_for(
+            hedged(attempt, _hedge_delay()), budget
         )
+        if winner != "unhedged":
+            HEDGES.labels("identify", winner).inc()
         identify_text = (identify_response.text or "").strip().strip('"').strip(".")
         if identify_text:
             entity = identify_text
+    except asyncio.TimeoutError:
+        logger.warning("Identify step exceeded its %.1fs budget; using generic entity", budget)
+        FALLBACKS.labels("identify_entity").inc()
     except Exception:
         logger.exception("Identify step failed; continuing with generic entity")
+        FALLBACKS.labels("identify_entity").inc()
     return entity
 
 
-async def create_character_from_entity(entity: str) -> IdentifyResponse:
-    client = _get_client()
-    research_summary = ""
-    canonical_facts: list[str] = []
-    source_urls: list[str] = []
-    try:
-        research_response = client.models.generate_content(
-            model=settings.gemini_model,
-            contents=RESEARCH_PROMPT_TEMPLATE.format(entity=entity),
-            config=_google_search_tool_config(),
-        )
-        research_data = _parse_json_response(research_response.text or "{}")
-        grounded_urls = _extract_grounded_urls(research_response)
-        source_urls = research_data.get("source_urls", []) or []
-        source_urls = [u for u in source_urls if isinstance(u, str)]
-        if grounded_urls:
-            source_urls = grounded_urls + [u for u in source_urls if u not in grounded_urls]
-        source_urls = source_urls[:8]
-        research_summary = str(research_data.get("research_summary", "")).strip()
-        canonical_facts = [
-            str(f).strip()
-            for f in (research_data.get("canonical_facts", []) or [])
-            if str(f).strip()
-        ][:8]
-    except Exception:
-        logger.exception("Research step failed for entity: %s", entity)
-        research_summary = (
-            f"{entity} is an interesting subject with history and stories to explore."
+async def create_character_from_entity(
+    entity: str, on_event: PipelineListener | None = None, deadline: Deadline | None = None
+) -> IdentifyResponse:
+    """Return the character for entity, served from cache when already built.
+
+    A build is bounded by deadline, or by a fresh identify deadline.
+    """
+    built = False
+
+    async def build() -> tuple[IdentifyResponse, bool]:
+        nonlocal built
+        built = True
+        return await _build_character(
+            entity, on_event, deadline or Deadline(settings.identify_deadline_seconds)
         )
 
+    response = await character_cache.get_or_create(entity, build)
+    if not built and on_event is not None:
+        # Cache hit, or another request's build: replay the stages at once.
+        await on_event("research", _research_event(response.character_profile))
+        await on_event("character", _character_event(response.character_profile, response.greeting))
+        await on_event("voice", {"voice_id": response.voice_id})
+    return response
+
+
+def _research_event(profile: CharacterProfile) -> dict:
+    return {
+        "research_summary": profile.research_summary,
+        "canonical_facts": profile.canonical_facts,
+        "source_urls": profile.source_urls,
+    }
+
+
+def _character_event(profile: CharacterProfile, greeting: str) -> dict:
+    return {"character_profile": profile.model_dump(), "greeting": greeting}
+
+
+def _research_from_response(entity: str, research_response: Any) -> dict:
+    research_data = _parse_json_response(research_response.text or "{}")
+    grounded_urls = _extract_grounded_urls(research_response)
+    source_urls = research_data.get("source_urls", []) or []
+    source_urls = [u for u in source_urls if isinstance(u, str)]
+    if grounded_urls:
+        source_urls = grounded_urls + [u for u in source_urls if u not in grounded_urls]
+    canonical_facts = [
+        str(f).strip()
+        for f in (research_data.get("canonical_facts", []) or [])
+        if str(f).strip()
+    ][:8]
+    return _research(
+        entity,
+        str(research_data.get("research_summary", "")).strip(),
+        canonical_facts,
+        source_urls[:8],
+    )
+
+
+def _research(
+    entity: str, research_summary: str, canonical_facts: list[str], source_urls: list[str]
+) -> dict:
     if not canonical_facts:
         canonical_facts = [f"I am known as {entity}.", "I have a story worth exploring."]
+    return {
+        "research_summary": research_summary,
+        "canonical_facts": canonical_facts,
+        "source_urls": source_urls,
+    }
 
-    research = json.dumps(
-        {
-            "research_summary": research_summary,
-            "canonical_facts": canonical_facts,
-            "source_urls": source_urls,
-        },
-        ensure_ascii=True,
+
+def _fallback_research(entity: str) -> dict:
+    return _research(
+        entity,
+        f"{entity} is an interesting subject with history and stories to explore.",
+        [],
+        [],
     )
 
-    # --- STEP 3: Create character profile ---
+
+def _profile_from_character_data(
+    entity: str, character_data: dict, research: dict
+) -> tuple[CharacterProfile, str]:
+    canonical_facts = research["canonical_facts"]
+    profile = CharacterProfile(
+        name=character_data.get("name", entity),
+        backstory=character_data.get(
+            "backstory",
+            f"I am {entity}, and I love sharing my story with curious kids.",
+        ),
+        personality_traits=character_data.get(
+            "personality_traits",
+            ["curious", "friendly", "kind", "playful", "thoughtful"],
+        ),
+        speaking_style=character_data.get(
+            "speaking_style",
+            "Warm, simple, and playful with short kid-friendly sentences.",
+        ),
+        voice_description=character_data.get(
+            "voice_description",
+            "A warm, expressive, friendly storyteller voice with gentle energy.",
+        ),
+        fun_facts=character_data.get("fun_facts", canonical_facts[:3]),
+        research_summary=research["research_summary"],
+        canonical_facts=character_data.get("canonical_facts", canonical_facts)
+        or canonical_facts,
+        source_urls=research["source_urls"],
+    )
+    greeting = character_data.get(
+        "greeting", f"Hi! I am {profile.name}! Want to hear my story? 🌟"
+    )
+    return profile, greeting
+
+
+def _fallback_character(entity: str, research: dict) -> tuple[CharacterProfile, str]:
+    profile = CharacterProfile(
+        name=entity,
+        backstory=f"I am {entity}, and I love sharing my story with curious kids.",
+        personality_traits=["curious", "friendly", "kind", "playful", "thoughtful"],
+        speaking_style="Warm, simple, and playful with short kid-friendly sentences.",
+        voice_description="A warm, expressive, friendly storyteller voice with gentle energy.",
+        fun_facts=research["canonical_facts"][:3],
+        research_summary=research["research_summary"],
+        canonical_facts=research["canonical_facts"],
+        source_urls=research["source_urls"],
+    )
+    return profile, f"Hi! I am {entity}! Ask me anything about me 🌟"
+
+
+_JSON_STRING_FIELD = r'"{field}"\s*:\s*"((?:[^"\\]|\\.)*)"'
+
+
+def _partial_string_field(text: str, field: str) -> str | None:
+    """A complete string field from possibly unfinished JSON, or None."""
+    match = re.search(_JSON_STRING_FIELD.format(field=field), text)
+    if match is None:
+        return None
     try:
-        character_response = client.models.generate_content(
+        return json.loads(f'"{match.group(1)}"')
+    except json.JSONDecodeError:
+        return None
+
+
+def _voice_brief(text: str) -> tuple[str, str] | None:
+    """(voice_description, greeting) once both have streamed out."""
+    voice_description = _partial_string_field(text, "voice_description")
+    greeting = _partial_string_field(text, "greeting")
+    if voice_description and greeting:
+        return voice_description, greeting
+    return None
+
+
+async def _stream_character_json(
+    client: genai.Client, entity: str, research: dict, ctx: StageContext
+) -> str:
+    """Stream the character JSON, publishing voice_brief as soon as it appears."""
+    prompt = CHARACTER_CREATION_PROMPT_TEMPLATE.format(
+        entity=entity, research=json.dumps(research, ensure_ascii=True)
+    )
+    parts: list[str] = []
+    async for chunk in _stream_content(
+        client,
+        "character",
+        model=settings.gemini_model,
+        contents=prompt,
+        config={"response_mime_type": "application/json"},
+    ):
+        if chunk.text:
+            parts.append(chunk.text)
+        if not ctx.published("voice_brief"):
+            brief = _voice_brief("".join(parts))
+            if brief is not None:
+                ctx.publish("voice_brief", brief)
+    return "".join(parts)
+
+
+def _character_stages(entity: str) -> list[Stage]:
+    """Research -> character -> voice, with voice design starting as soon as
+    the profile's voice_description and greeting have streamed out rather
+    than after the whole profile is written."""
+    client = _get_client()
+
+    async def research(ctx: StageContext) -> dict:
+        research_response = await _generate_content(
+            client,
+            "research",
             model=settings.gemini_model,
-            contents=CHARACTER_CREATION_PROMPT_TEMPLATE.format(
-                entity=entity, research=research
-            ),
-            config={"response_mime_type": "application/json"},
-        )
-        character_data = _parse_json_response(character_response.text or "{}")
-        profile = CharacterProfile(
-            name=character_data.get("name", entity),
-            backstory=character_data.get(
-                "backstory",
-                f"I am {entity}, and I love sharing my story with curious kids.",
-            ),
-            personality_traits=character_data.get(
-                "personality_traits",
-                ["curious", "friendly", "kind", "playful", "thoughtful"],
-            ),
-            speaking_style=character_data.get(
-                "speaking_style",
-                "Warm, simple, and playful with short kid-friendly sentences.",
-            ),
-            voice_description=character_data.get(
-                "voice_description",
-                "A warm, expressive, friendly storyteller voice with gentle energy.",
-            ),
-            fun_facts=character_data.get("fun_facts", canonical_facts[:3]),
-            research_summary=research_summary,
-            canonical_facts=character_data.get("canonical_facts", canonical_facts)
-            or canonical_facts,
-            source_urls=source_urls,
-        )
-        greeting = character_data.get(
-            "greeting", f"Hi! I am {profile.name}! Want to hear my story? 🌟"
+            contents=RESEARCH_PROMPT_TEMPLATE.format(entity=entity),
+            config=_google_search_tool_config(),
         )
-    except Exception:
-        logger.exception("Character creation failed for entity: %s", entity)
-        profile = CharacterProfile(
-            name=entity,
-            backstory=f"I am {entity}, and I love sharing my story with curious kids.",
-            personality_traits=["curious", "friendly", "kind", "playful", "thoughtful"],
-            speaking_style="Warm, simple, and playful with short kid-friendly sentences.",
-            voice_description="A warm, expressive, friendly storyteller voice with gentle energy.",
-            fun_facts=canonical_facts[:3],
-            research_summary=research_summary,
-            canonical_facts=canonical_facts,
-            source_urls=source_urls,
+        return _research_from_response(entity, research_response)
+
+    async def character(ctx: StageContext) -> tuple[CharacterProfile, str]:
+        research_data = ctx.value("research")
+        text = await _stream_character_json(client, entity, research_data, ctx)
+        return _profile_from_character_data(
+            entity, _parse_json_response(text or "{}"), research_data
         )
-        greeting = f"Hi! I am {entity}! Ask me anything about me 🌟"
 
-    # --- STEP 4: Design a custom voice ---
-    try:
-        voice_id = await design_voice(
-            voice_description=profile.voice_description,
+    async def voice(ctx: StageContext) -> tuple[str, asyncio.Task[str] | None]:
+        voice_description, greeting = ctx.value("voice_brief")
+        return await voice_for_character(
+            voice_description=voice_description,
             preview_text=greeting,
         )
-    except Exception:
-        # Fall back to default voice if voice design fails
-        voice_id = settings.elevenlabs_voice_id
 
-    return IdentifyResponse(
+    return [
+        Stage(
+            "research",
+            research,
+            fallback=lambda ctx, exc: _fallback_research(entity),
+            timeout=settings.research_timeout_seconds,
+            budget_share=_RESEARCH_BUDGET_SHARE,
+        ),
+        Stage(
+            "character",
+            character,
+            fallback=lambda ctx, exc: _fallback_character(entity, ctx.value("research")),
+            deps=("research",),
+            timeout=settings.character_timeout_seconds,
+            budget_share=_CHARACTER_BUDGET_SHARE,
+            provides={"voice_brief": lambda value: (value[0].voice_description, value[1])},
+        ),
+        Stage(
+            "voice",
+            voice,
+            # Fall back to default voice if voice design fails
+            fallback=lambda ctx, exc: (settings.elevenlabs_voice_id, None),
+            deps=("voice_brief",),
+            timeout=settings.voice_timeout_seconds,
+            announce_after=("character",),
+        ),
+    ]
+
+
+async def _build_character(
+    entity: str, on_event: PipelineListener | None = None, deadline: Deadline | None = None
+) -> tuple[IdentifyResponse, bool]:
+    """Run the character stage graph; flag whether any stage fell back."""
+
+    async def relay(name: str, value: Any) -> None:
+        if on_event is None:
+            return
+        if name == "research":
+            await on_event(name, dict(value))
+        elif name == "character":
+            await on_event(name, _character_event(*value))
+        elif name == "voice":
+            await on_event(name, {"voice_id": value[0]})
+
+    start = time.perf_counter()
+    result = await run_stages(
+        _character_stages(entity), on_stage=relay, label=entity, deadline=deadline
+    )
+    logger.info(
+        "character pipeline entity=%s %s total_ms=%.0f fallbacks=%s",
+        entity,
+        " ".join(f"{name}_ms={ms:.0f}" for name, ms in result.timings_ms.items()),
+        (time.perf_counter() - start) * 1000,
+        ",".join(sorted(result.fell_back)) or "none",
+    )
+
+    profile, greeting = result.values["character"]
+    voice_id, pending_voice = result.values["voice"]
+    response = IdentifyResponse(
         entity=entity,
         greeting=greeting,
         character_profile=profile,
         voice_id=voice_id,
     )
+    if pending_voice is not None:
+        _spawn(_upgrade_cached_voice(entity, response, pending_voice))
+    return response, not result.fell_back
 
 
-async def generate_chat_response(
-    character_profile: CharacterProfile,
-    conversation_history: list[ConversationMessage],
-) -> str:
-    client = _get_client()
-    system_prompt = CHAT_SYSTEM_PROMPT_TEMPLATE.format(
+def _spawn(coro: Coroutine[Any, Any, None]) -> None:
+    """Run coro in the background, holding a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _upgrade_cached_voice(
+    entity: str, response: IdentifyResponse, pending_voice: asyncio.Task[str]
+) -> None:
+    """Swap the designed voice into the cached character once it is ready."""
+    key = character_key(entity)
+    try:
+        voice_id = await pending_voice
+    except Exception:
+        logger.exception("Background voice design failed for entity: %s", entity)
+        # Drop the provisional default-voice character so the next visit retries.
+        await character_cache.discard(key)
+        return
+    await character_cache.put(key, response.model_copy(update={"voice_id": voice_id}))
+
+
+def render_system_prompt(character_profile: CharacterProfile) -> str:
+    return CHAT_SYSTEM_PROMPT_TEMPLATE.format(
         name=character_profile.name,
         backstory=character_profile.backstory,
         traits=", ".join(character_profile.personality_traits),
@@ -240,14 +566,138 @@ async def generate_chat_response(
         source_urls="\n".join(f"- {u}" for u in character_profile.source_urls),
     )
 
+
+async def _summarize_turns(summary: str, messages: list[ConversationMessage]) -> str:
+    transcript = "\n".join(
+        f"{'Child' if m.role == 'user' else 'Character'}: {m.text}" for m in messages
+    )
+    response = await _generate_content(
+        _get_client(),
+        "summary",
+        model=settings.gemini_model,
+        contents=CHAT_SUMMARY_PROMPT_TEMPLATE.format(
+            summary=summary or "(none yet)", transcript=transcript
+        ),
+    )
+    return response.text
+
+
+def _build_chat_request(
+    client: genai.Client,
+    system_prompt: str,
+    conversation_history: list[ConversationMessage],
+    session: ChatSession | None = None,
+) -> tuple[list[dict], dict]:
+    if session is None:
+        summary, recent = history_manager.compact(
+            conversation_history,
+            _summarize_turns,
+            trimmed_digest=conversation_seed(system_prompt),
+        )
+    else:
+        summary, recent = history_manager.compact(
+            conversation_history,
+            _summarize_turns,
+            session.trimmed,
+            session.trimmed_digest,
+        )
     contents = []
-    for msg in conversation_history:
+    # The summary rides in contents, not the system prompt, so the prompt
+    # stays identical across turns and its context cache stays valid.
+    if summary:
+        text = CHAT_SUMMARY_CONTEXT_TEMPLATE.format(summary=summary)
+        contents.append({"role": "user", "parts": [{"text": text}]})
+    for msg in recent:
         role = "user" if msg.role == "user" else "model"
         contents.append({"role": role, "parts": [{"text": msg.text}]})
 
-    response = client.models.generate_content(
-        model=settings.gemini_model,
-        contents=contents,
-        config={"system_instruction": system_prompt},
+    cached = context_cache.lookup(client, settings.gemini_model, system_prompt)
+    if cached is not None:
+        return contents, {"cached_content": cached}
+    return contents, {"system_instruction": system_prompt}
+
+
+async def generate_reply(
+    system_prompt: str,
+    conversation_history: list[ConversationMessage],
+    session: ChatSession | None = None,
+) -> str:
+    """In-character reply given an already rendered system prompt."""
+    client = _get_client()
+    contents, config = _build_chat_request(
+        client, system_prompt, conversation_history, session
     )
+    try:
+        response = await _generate_content(
+            client, "chat", model=settings.gemini_model, contents=contents, config=config
+        )
+    except Exception as exc:
+        if "cached_content" not in config or not rejects_cached_content(exc):
+            raise
+        logger.warning("Chat cached context was rejected; retrying with inline prompt")
+        FALLBACKS.labels("context_cache_inline").inc()
+        context_cache.invalidate(settings.gemini_model, system_prompt)
+        response = await _generate_content(
+            client,
+            "chat",
+            model=settings.gemini_model,
+            contents=contents,
+            config={"system_instruction": system_prompt},
+        )
+    context_cache.record_usage(response.usage_metadata)
     return response.text.strip()
+
+
+async def stream_reply(
+    system_prompt: str,
+    conversation_history: list[ConversationMessage],
+    session: ChatSession | None = None,
+) -> AsyncIterator[str]:
+    """Yield the in-character reply as Gemini streams it, chunk by chunk."""
+    client = _get_client()
+    contents, config = _build_chat_request(
+        client, system_prompt, conversation_history, session
+    )
+    yielded = False
+    usage = None
+    try:
+        async for chunk in _stream_content(
+            client, "chat_stream", model=settings.gemini_model, contents=contents, config=config
+        ):
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yielded = True
+                yield chunk.text
+    except Exception as exc:
+        # A cache that expired upstream fails before any text; redo the turn
+        # inline. Anything else, or a failure mid-reply, propagates.
+        if yielded or "cached_content" not in config or not rejects_cached_content(exc):
+            raise
+        logger.warning("Chat stream cached context was rejected; retrying with inline prompt")
+        FALLBACKS.labels("context_cache_inline").inc()
+        context_cache.invalidate(settings.gemini_model, system_prompt)
+        async for chunk in _stream_content(
+            client,
+            "chat_stream",
+            model=settings.gemini_model,
+            contents=contents,
+            config={"system_instruction": system_prompt},
+        ):
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+    context_cache.record_usage(usage)
+
+
+async def generate_chat_response(
+    character_profile: CharacterProfile,
+    conversation_history: list[ConversationMessage],
+) -> str:
+    return await generate_reply(render_system_prompt(character_profile), conversation_history)
+
+
+def stream_chat_response(
+    character_profile: CharacterProfile,
+    conversation_history: list[ConversationMessage],
+) -> AsyncIterator[str]:
+    return stream_reply(render_system_prompt(character_profile), conversation_history)
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, NamedTuple
+
+from app.config import settings
+from app.models.schemas import ChatSession, ConversationMessage
+
+logger = logging.getLogger(__name__)
+
+# Folds messages into an existing summary ("" for none) and returns the new one.
+Summarizer = Callable[[str, list[ConversationMessage]], Awaitable[str]]
+
+# Role label and turn separators cost a few tokens on top of the text.
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters each), good enough for budgets."""
+    return len(text) // 4
+
+
+def chain_digest(digest: str, messages: list[ConversationMessage]) -> str:
+    """digest of the messages before these, extended by these messages.
+
+    Chaining lets a session drop its oldest messages and keep only their
+    digest, which still validates summaries that cover them.
+    """
+    for m in messages:
+        digest = hashlib.sha256(f"{digest}\0{m.role}\0{m.text}".encode()).hexdigest()
+    return digest
+
+
+def conversation_seed(system_prompt: str) -> str:
+    """chain_digest starting point for a stateless conversation's messages."""
+    return chain_digest("", [ConversationMessage(role="system", text=system_prompt)])
+
+
+def trim_history(session: ChatSession, max_messages: int) -> None:
+    """Drop the oldest messages beyond max_messages, recording them as trimmed."""
+    excess = len(session.history) - max_messages
+    if excess <= 0:
+        return
+    session.trimmed_digest = chain_digest(session.trimmed_digest, session.history[:excess])
+    session.trimmed += excess
+    del session.history[:excess]
+
+
+class _Summary(NamedTuple):
+    covered: int  # messages since the start of the conversation folded into text
+    text: str
+
+
+class HistoryManager:
+    """Fits chat history into a token budget without dropping older context.
+
+    The newest messages are kept verbatim up to the budget; everything
+    before them is represented by a running summary. Summaries are built
+    incrementally in background tasks, after the turn that first needed
+    them, so a turn never waits on one: until the summary catches up, the
+    not-yet-folded messages are simply left out.
+
+    A summary is stored under the chain_digest of the messages it covers,
+    so conversations that open the same way (a cached character's greeting,
+    then "hi") share summaries only for the turns they actually share.
+    """
+
+    def __init__(self, token_budget: int, max_entries: int):
+        self._budget = token_budget
+        self._max_entries = max_entries
+        self._summaries: OrderedDict[str, _Summary] = OrderedDict()
+        self._pending: dict[str, asyncio.Task] = {}  # by digest the fold will cover
+        self.folds = 0
+        self.failures = 0
+
+    def _split(self, history: list[ConversationMessage]) -> int:
+        """Index of the first message kept verbatim; always keeps the last one."""
+        start = len(history)
+        used = 0
+        while start > 0:
+            cost = estimate_tokens(history[start - 1].text) + _MESSAGE_OVERHEAD_TOKENS
+            if used + cost > self._budget and start < len(history):
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def compact(
+        self,
+        history: list[ConversationMessage],
+        summarize: Summarizer,
+        trimmed: int = 0,
+        trimmed_digest: str = "",
+    ) -> tuple[str, list[ConversationMessage]]:
+        """(summary of older turns, recent turns within the token budget).
+
+        history follows `trimmed` earlier messages that are no longer held
+        (see trim_history) and whose chain_digest is trimmed_digest; for a
+        stateless conversation that is conversation_seed(system_prompt).
+        Summary offsets count from the conversation's first message, so
+        dropping old messages keeps the summary valid.
+        """
+        start = self._split(history)
+        if trimmed + start == 0:
+            return "", history
+        # digests[i]: chain_digest of the conversation up to history[:i].
+        digests = [trimmed_digest]
+        for message in history[:start]:
+            digests.append(chain_digest(digests[-1], [message]))
+        summary, folded = "", 0
+        for index in range(start, -1, -1):
+            cached = self._summaries.get(digests[index])
+            if cached is not None and cached.covered == trimmed + index:
+                summary, folded = cached.text, index
+                self._summaries.move_to_end(digests[index])
+                break
+        unfolded = history[folded:start]
+        if unfolded and not any(digest in self._pending for digest in digests[folded + 1 :]):
+            target = digests[start]
+            task = asyncio.create_task(
+                self._fold(digests[folded], target, summary, trimmed + folded, unfolded, summarize)
+            )
+            self._pending[target] = task
+            task.add_done_callback(lambda _: self._pending.pop(target, None))
+        return summary, history[start:]
+
+    async def _fold(
+        self,
+        base: str,
+        digest: str,
+        summary: str,
+        covered: int,
+        messages: list[ConversationMessage],
+        summarize: Summarizer,
+    ) -> None:
+        try:
+            text = await summarize(summary, messages)
+        except Exception:
+            self.failures += 1
+            logger.exception("History summary failed for %s", digest[:12])
+            return
+        self.folds += 1
+        # The summary this one extends is superseded; a conversation sharing
+        # exactly those messages would just fold them again.
+        self._summaries.pop(base, None)
+        self._summaries[digest] = _Summary(covered + len(messages), text.strip())
+        self._summaries.move_to_end(digest)
+        while len(self._summaries) > self._max_entries:
+            self._summaries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "summaries": len(self._summaries),
+            "pending": len(self._pending),
+            "folds": self.folds,
+            "failures": self.failures,
+        }
+
+
+history_manager = HistoryManager(
+    token_budget=settings.chat_history_token_budget,
+    max_entries=settings.chat_summary_max_entries,
+)
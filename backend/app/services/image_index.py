@@ -0,0 +1,76 @@
+from collections import OrderedDict
+
+from PIL import Image
+
+from app.config import settings
+
+_HASH_SIZE = 8
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: one bit per horizontally adjacent pixel pair.
+
+    Robust to rescaling, recompression and small shifts in framing, so two
+    photos of the same exhibit from nearly the same spot land a few bits apart.
+    """
+    gray = image.convert("L").resize(
+        (_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.LANCZOS
+    )
+    pixels = gray.tobytes()
+    fingerprint = 0
+    for row in range(_HASH_SIZE):
+        offset = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            left = pixels[offset + col]
+            right = pixels[offset + col + 1]
+            fingerprint = (fingerprint << 1) | (left > right)
+    return fingerprint
+
+
+class ImageHashIndex:
+    """Bounded LRU map from image fingerprints to identified entity names.
+
+    Lookups scan every entry by Hamming distance; at the default few thousand
+    entries that is well under a millisecond, far below one vision call.
+    """
+
+    def __init__(self, max_entries: int, max_distance: int):
+        self._max_entries = max_entries
+        self._max_distance = max_distance
+        self._entries: OrderedDict[int, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, fingerprint: int) -> str | None:
+        """Entity of the nearest stored image within the distance threshold."""
+        best_key = None
+        best_distance = self._max_distance + 1
+        for key in self._entries:
+            distance = (key ^ fingerprint).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+                if distance == 0:
+                    break
+        if best_key is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_key)
+        self.hits += 1
+        return self._entries[best_key]
+
+    def add(self, fingerprint: int, entity: str) -> None:
+        if self._max_entries <= 0:
+            return
+        self._entries[fingerprint] = entity
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+image_index = ImageHashIndex(
+    max_entries=settings.image_index_max_entries,
+    max_distance=settings.image_index_max_distance,
+)
@@ -0,0 +1,83 @@
+import asyncio
+import io
+import logging
+import time
+from typing import BinaryIO, NamedTuple
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.services.metrics import PAYLOAD_BYTES
+from app.services.image_index import dhash
+
+logger = logging.getLogger(__name__)
+
+_FORMAT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class PreparedImage(NamedTuple):
+    mime_type: str
+    data: bytes
+    # Perceptual hash of the photo, or None when it could not be decoded.
+    fingerprint: int | None
+
+
+def _source_size(image: bytes | BinaryIO) -> int:
+    if isinstance(image, bytes):
+        return len(image)
+    position = image.tell()
+    size = image.seek(0, io.SEEK_END)
+    image.seek(position)
+    return size
+
+
+def _read_source(image: bytes | BinaryIO) -> bytes:
+    if isinstance(image, bytes):
+        return image
+    image.seek(0)
+    return image.read()
+
+
+def preprocess_image(mime_type: str, image: bytes | BinaryIO) -> PreparedImage:
+    """Downscale to IMAGE_MAX_EDGE, drop EXIF, re-encode and fingerprint.
+
+    image may be bytes or a seekable file, which Pillow decodes directly
+    without first copying it into memory. Returns the input unchanged when
+    Pillow cannot decode it, so an odd format still reaches Gemini rather
+    than failing the identify.
+    """
+    image_format = settings.image_format.upper()
+    if image_format not in _FORMAT_MIME_TYPES:
+        image_format = "JPEG"
+    try:
+        stream = io.BytesIO(image) if isinstance(image, bytes) else image
+        with Image.open(stream) as source:
+            # Apply the EXIF orientation before the metadata is discarded.
+            prepared = ImageOps.exif_transpose(source)
+            prepared.thumbnail((settings.image_max_edge, settings.image_max_edge))
+            if prepared.mode not in ("RGB", "L"):
+                prepared = prepared.convert("RGB")
+            output = io.BytesIO()
+            prepared.save(output, format=image_format, quality=settings.image_quality)
+            fingerprint = dhash(prepared)
+    except Exception:
+        logger.exception("Image pre-processing failed; sending original bytes")
+        return PreparedImage(mime_type, _read_source(image), None)
+    return PreparedImage(_FORMAT_MIME_TYPES[image_format], output.getvalue(), fingerprint)
+
+
+async def prepare_image(mime_type: str, image: bytes | BinaryIO) -> PreparedImage:
+    """Run preprocess_image off the event loop and log the size reduction."""
+    start = time.perf_counter()
+    size_in = _source_size(image)
+    prepared = await asyncio.to_thread(preprocess_image, mime_type, image)
+    PAYLOAD_BYTES.labels("image_upload").observe(size_in)
+    PAYLOAD_BYTES.labels("image_prepared").observe(len(prepared.data))
+    logger.info(
+        "image preprocess bytes_in=%d bytes_out=%d mime=%s elapsed_ms=%.0f",
+        size_in,
+        len(prepared.data),
+        prepared.mime_type,
+        (time.perf_counter() - start) * 1000,
+    )
+    return prepared
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Any, Callable, Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.registry import Collector
+
+# Seconds; upstream calls range from a cached lookup to a long voice design.
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+_SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7)
+
+REQUEST_SECONDS = Histogram(
+    "curiocity_request_seconds",
+    "Request duration per route, until the last byte of a streamed body.",
+    ["route", "method", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPSTREAM_SECONDS = Histogram(
+    "curiocity_upstream_seconds",
+    "Duration of each call to Gemini, Deepgram or ElevenLabs.",
+    ["service", "operation", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPSTREAM_FIRST_CHUNK_SECONDS = Histogram(
+    "curiocity_upstream_first_chunk_seconds",
+    "Time to the first chunk of a streamed upstream response.",
+    ["service", "operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "curiocity_stage_seconds",
+    "Character pipeline stage duration, fallbacks included.",
+    ["stage", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+PAYLOAD_BYTES = Histogram(
+    "curiocity_payload_bytes",
+    "Sizes of photos, audio and other bodies on the hot path.",
+    ["kind"],
+    buckets=_SIZE_BUCKETS,
+)
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "curiocity_upstream_queue_depth",
+    "Calls waiting for an upstream slot, per priority lane.",
+    ["service", "lane"],
+)
+UPSTREAM_QUEUE_SECONDS = Histogram(
+    "curiocity_upstream_queue_seconds",
+    "Time a call waited for an upstream slot and rate token.",
+    ["service", "lane"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPSTREAM_RETRIES = Counter(
+    "curiocity_upstream_retries_total",
+    "Upstream calls retried after a rate-limit response.",
+    ["service"],
+)
+HEDGES = Counter(
+    "curiocity_hedges_total",
+    "Calls raced against a second attempt after running past their p95, by winner.",
+    ["operation", "winner"],
+)
+FALLBACKS = Counter(
+    "curiocity_fallbacks_total",
+    "Requests or stages served by a fallback path.",
+    ["path"],
+)
+
+
+class UpstreamSpan:
+    """Times one upstream call into UPSTREAM_SECONDS, labelled by outcome.
+
+    Streaming callers call first_chunk() when data starts to arrive.
+    """
+
+    __slots__ = ("service", "operation", "_start", "_first_seen")
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+        self._first_seen = False
+
+    def __enter__(self) -> "UpstreamSpan":
+        self._start = time.perf_counter()
+        return self
+
+    def first_chunk(self) -> None:
+        if not self._first_seen:
+            self._first_seen = True
+            UPSTREAM_FIRST_CHUNK_SECONDS.labels(self.service, self.operation).observe(
+                time.perf_counter() - self._start
+            )
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+        UPSTREAM_SECONDS.labels(self.service, self.operation, outcome).observe(
+            time.perf_counter() - self._start
+        )
+
+
+def upstream_span(service: str, operation: str) -> UpstreamSpan:
+    return UpstreamSpan(service, operation)
+
+
+class CacheStatsCollector(Collector):
+    """Exports the caches' own hit/miss counters at scrape time.
+
+    The caches already count lookups for /api/stats, so reading them here
+    adds nothing to the request path.
+    """
+
+    def __init__(self, sources: dict[str, Callable[[], dict[str, Any] | None]]):
+        self._sources = sources
+
+    def collect(self) -> Iterator[CounterMetricFamily]:
+        family = CounterMetricFamily(
+            "curiocity_cache_lookups",
+            "Cache lookups by cache and result.",
+            labels=["cache", "result"],
+        )
+        for cache, stats in self._sources.items():
+            counters = stats()
+            if counters is None:
+                continue
+            for result in ("hits", "pack_hits", "disk_hits", "shared_misses", "misses"):
+                if result in counters:
+                    family.add_metric([cache, result], counters[result])
+        yield family
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware observing REQUEST_SECONDS per matched route template.
+
+    Timing ends when the app returns, i.e. after a streamed body's last
+    chunk, so streaming endpoints report their full duration.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = "500" if scope["type"] == "http" else "ws"
+
+        async def send_with_status(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                getattr(route, "path", "unmatched"), scope.get("method", "WS"), status
+            ).observe(time.perf_counter() - start)
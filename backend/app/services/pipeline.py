@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from app.services.deadlines import Deadline
+from app.services.metrics import FALLBACKS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StageContext:
+    """Results shared between stages, each exposed as a future by name.
+
+    A stage may publish() an intermediate value before it finishes, so
+    dependents can start on part of its output (e.g. the voice description
+    while the rest of the character profile is still streaming).
+    """
+
+    def __init__(self) -> None:
+        self._futures: dict[str, asyncio.Future] = {}
+
+    def _future(self, name: str) -> asyncio.Future:
+        if name not in self._futures:
+            self._futures[name] = asyncio.get_running_loop().create_future()
+        return self._futures[name]
+
+    def publish(self, name: str, value: Any) -> None:
+        future = self._future(name)
+        if not future.done():
+            future.set_result(value)
+
+    def published(self, name: str) -> bool:
+        return self._future(name).done()
+
+    def value(self, name: str) -> Any:
+        """Result of an already-resolved stage, e.g. a declared dependency."""
+        return self._future(name).result()
+
+    async def get(self, name: str) -> Any:
+        return await self._future(name)
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[StageContext], Awaitable[Any]]
+    # Value used when run raises or times out.
+    fallback: Callable[[StageContext, BaseException], Any]
+    deps: tuple[str, ...] = ()
+    timeout: float | None = None
+    # Share of the request deadline still left when the stage starts; the
+    # stage's budget is the smaller of that and timeout.
+    budget_share: float = 1.0
+    # Intermediate results this stage may publish early, derived from its
+    # final value when it never did (e.g. because it fell back).
+    provides: dict[str, Callable[[Any], Any]] = field(default_factory=dict)
+    # Stages whose on_stage events must go out before this one's, e.g. so a
+    # client never receives a voice for a character it has not seen yet.
+    announce_after: tuple[str, ...] = ()
+
+
+@dataclass
+class StageGraphResult:
+    values: dict[str, Any]
+    timings_ms: dict[str, float]
+    fell_back: set[str]
+
+
+StageListener = Callable[[str, Any], Awaitable[None]]
+
+
+async def run_stages(
+    stages: list[Stage],
+    on_stage: StageListener | None = None,
+    label: str = "",
+    deadline: Deadline | None = None,
+) -> StageGraphResult:
+    """Run stages concurrently, each as soon as its dependencies resolve.
+
+    Every stage always produces a value: a failure or timeout logs and uses
+    the stage's fallback, so dependents run exactly as they would after the
+    sequential try/except chain this replaces. With a deadline, a stage
+    reached after it has passed falls back without running.
+    """
+    ctx = StageContext()
+    timings: dict[str, float] = {}
+    fell_back: set[str] = set()
+    announced = {stage.name: asyncio.Event() for stage in stages}
+
+    async def run_one(stage: Stage) -> None:
+        for dep in stage.deps:
+            await ctx.get(dep)
+        timeout = stage.timeout
+        if deadline is not None:
+            timeout = deadline.budget(stage.budget_share, stage.timeout)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            value = await asyncio.wait_for(stage.run(ctx), timeout)
+        except Exception as exc:
+            if isinstance(exc, asyncio.TimeoutError):
+                logger.warning("Stage %s timed out after %.1fs (%s)", stage.name, timeout, label)
+            else:
+                logger.exception("Stage %s failed (%s)", stage.name, label)
+            value = stage.fallback(ctx, exc)
+            fell_back.add(stage.name)
+            outcome = "timeout" if isinstance(exc, asyncio.TimeoutError) else "error"
+            FALLBACKS.labels(f"{stage.name}_stage").inc()
+        elapsed = time.perf_counter() - start
+        timings[stage.name] = elapsed * 1000
+        STAGE_SECONDS.labels(stage.name, outcome).observe(elapsed)
+        for name, derive in stage.provides.items():
+            if not ctx.published(name):
+                ctx.publish(name, derive(value))
+        ctx.publish(stage.name, value)
+        for name in stage.announce_after:
+            await announced[name].wait()
+        try:
+            if on_stage is not None:
+                await on_stage(stage.name, value)
+        finally:
+            announced[stage.name].set()
+
+    await asyncio.gather(*(run_one(stage) for stage in stages))
+    values = {stage.name: await ctx.get(stage.name) for stage in stages}
+    return StageGraphResult(values, timings, fell_back)
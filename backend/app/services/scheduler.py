@@ -0,0 +1,285 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import aclosing, asynccontextmanager, suppress
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+from deepgram import DeepgramApiError
+from google.genai import errors as genai_errors
+
+from app.config import settings
+from app.services.metrics import UPSTREAM_QUEUE_DEPTH, UPSTREAM_QUEUE_SECONDS, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Returns the delay the upstream asked for if exc is a rate-limit response
+# (0.0 when it named none), else None.
+RateLimitCheck = Callable[[BaseException], float | None]
+
+# Longer Retry-After values are capped; by then the caller's own timeout and
+# fallback serve the user better than waiting.
+_MAX_RETRY_AFTER_SECONDS = 30.0
+
+
+class Priority(IntEnum):
+    """Queue lanes; lower values are dispatched first, see UpstreamScheduler."""
+
+    INTERACTIVE = 0  # chat turns, speech synthesis, transcription
+    PIPELINE = 1  # identify, research, character and voice design
+    BACKGROUND = 2  # history summaries, context caches
+
+
+class UpstreamScheduler:
+    """Admission control for one upstream API.
+
+    Calls queue in priority lanes and start once both a concurrency slot and
+    a token from the rate bucket are free, so a burst of identifies waits
+    behind chat turns instead of beside them. Lanes age: a call ranks as if
+    it had been queued lane_aging_seconds per lane later, so once a pipeline
+    call has waited that long it goes ahead of newly queued chat turns and
+    sustained interactive load cannot starve it. A rate-limit response pauses
+    the bucket for the Retry-After the upstream sent, since the limit is the
+    account's rather than the call's, and the call is retried after jittered
+    exponential backoff.
+
+    This only limits what is sent upstream. Waiting for a slot or a token
+    does not block the event loop either way; that comes from the calls
+    themselves using async clients.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        max_concurrency: int,
+        rate_per_second: float,
+        rate_limited: RateLimitCheck,
+        max_retries: int,
+        retry_base_seconds: float,
+        lane_aging_seconds: float,
+    ):
+        self.service = service
+        self._max_concurrency = max(1, max_concurrency)
+        self.set_rate(rate_per_second)
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._lane_aging = lane_aging_seconds
+        # (rank, arrival order, future); rank is queue time plus the lane's offset
+        self._waiters: list[tuple[float, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+        self._rate_limited = rate_limited
+        self._max_retries = max_retries
+        self._retry_base = retry_base_seconds
+        self.rate_limits = 0
+        self.retries = 0
+
+    def set_rate(self, rate_per_second: float) -> None:
+        """Replace the rate limit (0 for none), starting from a full bucket."""
+        self._rate = rate_per_second
+        self._burst = max(1.0, rate_per_second)
+        self._tokens = self._burst
+        self._refilled_at = time.monotonic()
+
+    def _take_token(self, now: float) -> float:
+        """0.0 after taking a token, else seconds until one is available."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._rate <= 0:
+            return 0.0
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._in_flight < self._max_concurrency:
+            if self._waiters[0][2].done():  # cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._take_token(time.monotonic())
+            if wait > 0:
+                if self._wakeup is None:
+                    self._wakeup = asyncio.get_running_loop().call_later(wait, self._on_wakeup)
+                return
+            _, _, future = heapq.heappop(self._waiters)
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        """Hold a concurrency slot, taken in priority order, for the block."""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        rank = time.monotonic() + priority * self._lane_aging
+        heapq.heappush(self._waiters, (rank, next(self._sequence), future))
+        lane = priority.name.lower()
+        depth = UPSTREAM_QUEUE_DEPTH.labels(self.service, lane)
+        depth.inc()
+        queued_at = time.perf_counter()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # granted just as the caller was cancelled
+            raise
+        finally:
+            depth.dec()
+        UPSTREAM_QUEUE_SECONDS.labels(self.service, lane).observe(time.perf_counter() - queued_at)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _retry_delay(self, exc: BaseException, attempt: int) -> float | None:
+        """Seconds to wait before retrying after exc, or None to raise it."""
+        requested = self._rate_limited(exc)
+        if requested is None:
+            return None
+        self.rate_limits += 1
+        if attempt >= self._max_retries:
+            return None
+        requested = min(requested, _MAX_RETRY_AFTER_SECONDS)
+        self._paused_until = max(self._paused_until, time.monotonic() + requested)
+        self.retries += 1
+        UPSTREAM_RETRIES.labels(self.service).inc()
+        delay = requested + random.uniform(0, self._retry_base * 2**attempt)
+        logger.warning("%s rate limited; retrying in %.1fs", self.service, delay)
+        return delay
+
+    async def call(self, priority: Priority, request: Callable[[], Awaitable[T]]) -> T:
+        """Run request() in a slot, retrying it when the upstream rate-limits it."""
+        attempt = 0
+        while True:
+            async with self.slot(priority):
+                try:
+                    return await request()
+                except Exception as exc:
+                    delay = self._retry_delay(exc, attempt)
+                    if delay is None:
+                        raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream(
+        self, priority: Priority, open_stream: Callable[[], AsyncGenerator[T, None]]
+    ) -> AsyncIterator[T]:
+        """Iterate open_stream() in a slot held until the stream ends.
+
+        A rate limit before the first item is retried as in call(); after
+        that, errors reach the caller.
+        """
+        attempt = 0
+        while True:
+            async with self.slot(priority):
+                async with aclosing(open_stream()) as items:
+                    try:
+                        first = await items.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    except Exception as exc:
+                        delay = self._retry_delay(exc, attempt)
+                        if delay is None:
+                            raise
+                    else:
+                        yield first
+                        async for item in items:
+                            yield item
+                        return
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": sum(not future.done() for _, _, future in self._waiters),
+            "rate_limits": self.rate_limits,
+            "retries": self.retries,
+        }
+
+
+def _retry_after(headers: Any) -> float:
+    """Seconds from a Retry-After header (delta or HTTP date), 0.0 if absent."""
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _gemini_rate_limit(exc: BaseException) -> float | None:
+    if not isinstance(exc, genai_errors.APIError) or exc.code != 429:
+        return None
+    delay = _retry_after(getattr(exc.response, "headers", None))
+    # Gemini names its delay in a RetryInfo detail, e.g. "retryDelay": "17s".
+    error = exc.details.get("error", {}) if isinstance(exc.details, dict) else {}
+    for detail in error.get("details", []):
+        retry_delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(retry_delay, str) and retry_delay.endswith("s"):
+            with suppress(ValueError):
+                delay = max(delay, float(retry_delay[:-1]))
+    return delay
+
+
+def _http_rate_limit(exc: BaseException) -> float | None:
+    if not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code != 429:
+        return None
+    return _retry_after(exc.response.headers)
+
+
+def _deepgram_rate_limit(exc: BaseException) -> float | None:
+    if not isinstance(exc, DeepgramApiError) or str(exc.status) != "429":
+        return None
+    return 0.0
+
+
+def _scheduler(service: str, max_concurrency: int, rate: float, check: RateLimitCheck) -> UpstreamScheduler:
+    return UpstreamScheduler(
+        service,
+        max_concurrency=max_concurrency,
+        rate_per_second=rate,
+        rate_limited=check,
+        max_retries=settings.upstream_max_retries,
+        retry_base_seconds=settings.upstream_retry_base_seconds,
+        lane_aging_seconds=settings.upstream_lane_aging_seconds,
+    )
+
+
+gemini_scheduler = _scheduler(
+    "gemini", settings.gemini_max_concurrency, settings.gemini_requests_per_second, _gemini_rate_limit
+)
+deepgram_scheduler = _scheduler(
+    "deepgram",
+    settings.deepgram_max_concurrency,
+    settings.deepgram_requests_per_second,
+    _deepgram_rate_limit,
+)
+elevenlabs_scheduler = _scheduler(
+    "elevenlabs",
+    settings.elevenlabs_max_concurrency,
+    settings.elevenlabs_requests_per_second,
+    _http_rate_limit,
+)
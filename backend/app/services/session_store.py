@@ -0,0 +1,107 @@
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.config import settings
+from app.models.schemas import ChatSession, ConversationMessage
+
+logger = logging.getLogger(__name__)
+
+_REDIS_KEY_PREFIX = "curiocity:session:"
+
+
+def new_session(entity: str, voice_id: str, system_prompt: str, greeting: str) -> ChatSession:
+    """Fresh session whose history opens with the character's greeting."""
+    return ChatSession(
+        session_id=secrets.token_urlsafe(16),
+        entity=entity,
+        voice_id=voice_id,
+        system_prompt=system_prompt,
+        history=[ConversationMessage(role="assistant", text=greeting)],
+    )
+
+
+class MemorySessionStore:
+    """Per-worker LRU of sessions; each entry expires ttl seconds after its last save."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, ChatSession]] = OrderedDict()
+
+    async def get(self, session_id: str) -> ChatSession | None:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        expires_at, session = entry
+        if expires_at <= time.monotonic():
+            del self._entries[session_id]
+            return None
+        self._entries.move_to_end(session_id)
+        # Callers mutate what they get; hand out a copy so an abandoned turn
+        # never leaks into the stored history.
+        return session.model_copy(deep=True)
+
+    async def save(self, session: ChatSession) -> None:
+        self._entries[session.session_id] = (time.monotonic() + self._ttl, session)
+        self._entries.move_to_end(session.session_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries)}
+
+
+class RedisSessionStore:
+    """Sessions as JSON values in Redis (or anything speaking its protocol),
+    shared by every worker and expired by the server via SET ... EX."""
+
+    def __init__(self, url: str, ttl_seconds: float):
+        # Optional dependency, only needed when SESSION_REDIS_URL is set.
+        from redis import asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._ttl = int(ttl_seconds)
+
+    async def get(self, session_id: str) -> ChatSession | None:
+        payload = await self._redis.get(_REDIS_KEY_PREFIX + session_id)
+        if payload is None:
+            return None
+        return ChatSession.model_validate_json(payload)
+
+    async def save(self, session: ChatSession) -> None:
+        await self._redis.set(
+            _REDIS_KEY_PREFIX + session.session_id, session.model_dump_json(), ex=self._ttl
+        )
+
+    async def delete(self, session_id: str) -> None:
+        await self._redis.delete(_REDIS_KEY_PREFIX + session_id)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "redis"}
+
+
+SessionStore = MemorySessionStore | RedisSessionStore
+
+
+def _create_session_store() -> SessionStore:
+    if settings.session_redis_url:
+        try:
+            return RedisSessionStore(settings.session_redis_url, settings.session_ttl_seconds)
+        except ImportError:
+            logger.error("SESSION_REDIS_URL is set but redis is not installed; using memory sessions")
+    return MemorySessionStore(settings.session_max_entries, settings.session_ttl_seconds)
+
+
+session_store = _create_session_store()
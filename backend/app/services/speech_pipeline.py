@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import re
+from typing import AsyncIterator
+
+import anyio
+
+from app.config import settings
+from app.services.elevenlabs_service import stream_speech
+
+logger = logging.getLogger(__name__)
+
+# Sentence end: terminal punctuation, optional closing quote/bracket, whitespace.
+_SENTENCE_BREAK = re.compile(r"[.!?…]+[\"')\]”’]*\s+")
+
+
+def _pop_sentences(buffer: str, min_chars: int) -> tuple[list[str], str]:
+    """Split complete sentences off the front of buffer, merging very short ones."""
+    sentences: list[str] = []
+    start = 0
+    for match in _SENTENCE_BREAK.finditer(buffer):
+        if match.end() - start >= min_chars:
+            sentences.append(buffer[start : match.end()].strip())
+            start = match.end()
+    return sentences, buffer[start:]
+
+
+async def split_sentences(
+    deltas: AsyncIterator[str], min_chars: int = 20
+) -> AsyncIterator[str]:
+    """Re-chunk a stream of text deltas into whole sentences as soon as each ends."""
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        sentences, buffer = _pop_sentences(buffer, min_chars)
+        for sentence in sentences:
+            yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def _synthesize(sentence: str, voice_id: str, chunks: asyncio.Queue[bytes | None]) -> None:
+    try:
+        async for chunk in await stream_speech(sentence, voice_id):
+            chunks.put_nowait(chunk)
+    except Exception:
+        logger.exception("Speech synthesis failed for sentence; skipping it")
+    finally:
+        chunks.put_nowait(None)
+
+
+async def synthesize_sentences(
+    sentences: AsyncIterator[str], voice_id: str
+) -> AsyncIterator[bytes]:
+    """Synthesize sentences concurrently and yield their audio in order.
+
+    The sentence being sent is relayed chunk by chunk as ElevenLabs streams it,
+    while up to SPEECH_PIPELINE_LOOKAHEAD later sentences buffer in the
+    background, so sentence 1 plays while later ones are still generating.
+    """
+    pending: asyncio.Queue[asyncio.Queue[bytes | None] | None] = asyncio.Queue(
+        maxsize=max(1, settings.speech_pipeline_lookahead)
+    )
+    tasks: set[asyncio.Task] = set()
+
+    async def produce() -> None:
+        try:
+            async for sentence in sentences:
+                chunks: asyncio.Queue[bytes | None] = asyncio.Queue()
+                task = asyncio.create_task(_synthesize(sentence, voice_id, chunks))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await pending.put(chunks)
+        except Exception:
+            # Keep whatever audio was already queued rather than dropping the reply.
+            logger.exception("Text stream failed mid-reply; ending speech early")
+        await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            chunks = await pending.get()
+            if chunks is None:
+                break
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+    finally:
+        # The client may have gone away mid-reply: stop the text stream and
+        # every synthesis still running, including the one being relayed, and
+        # wait for them so none outlives the response. Shielded because the
+        # response's cancel scope would cancel this wait too.
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+        with anyio.CancelScope(shield=True):
+            await asyncio.gather(producer, *tasks, return_exceptions=True)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+VoiceFetcher = Callable[[], Awaitable[list[dict]]]
+
+# Label boosts: (description keyword, label field, label substrings, points).
+_LABEL_BOOSTS = [
+    ("irish", "accent", ("irish",), 20),
+    ("male", "gender", ("male",), 12),
+    ("female", "gender", ("female",), 12),
+    ("older", "age", ("old", "middle"), 6),
+    ("story", "use_case", ("narration", "audiobook"), 6),
+]
+# Description tokens whose matching voices are remembered per snapshot.
+_MAX_EXPANDED_TOKENS = 4096
+
+
+def tokenize(text: str) -> set[str]:
+    return set(re.findall(r"[a-z]{3,}", (text or "").lower()))
+
+
+class VoiceIndex:
+    """Precomputed lookup structure over one snapshot of the voice list.
+
+    A description token scores for every voice whose name, description,
+    labels or category contain it as a substring ("story" matches
+    "storyteller"). The letter runs of those fields go into an inverted
+    index; a token is expanded once to the runs containing it, and the
+    label boosts are resolved to voice sets up front, so choosing a voice
+    only touches voices that share a token or a boost.
+    """
+
+    def __init__(self, voices: list[dict]):
+        self.voice_ids: list[str] = []
+        self._postings: dict[str, set[int]] = {}
+        self._matches: dict[str, frozenset[int]] = {}
+        self._boosted: list[set[int]] = [set() for _ in _LABEL_BOOSTS]
+        for position, voice in enumerate(voices):
+            self.voice_ids.append(voice.get("voice_id", ""))
+            labels = voice.get("labels") or {}
+            blob = " ".join(
+                [
+                    voice.get("name", "") or "",
+                    voice.get("description", "") or "",
+                    str(labels),
+                    voice.get("category", "") or "",
+                ]
+            ).lower()
+            for run in set(re.findall(r"[a-z]{3,}", blob)):
+                self._postings.setdefault(run, set()).add(position)
+            for boost_index, (_, field, needles, _) in enumerate(_LABEL_BOOSTS):
+                value = str(labels.get(field, "")).lower()
+                if any(needle in value for needle in needles):
+                    self._boosted[boost_index].add(position)
+
+    def __len__(self) -> int:
+        return len(self.voice_ids)
+
+    def _voices_containing(self, token: str) -> frozenset[int]:
+        matches = self._matches.get(token)
+        if matches is None:
+            if len(self._matches) >= _MAX_EXPANDED_TOKENS:
+                self._matches.clear()
+            matches = frozenset().union(
+                *(positions for run, positions in self._postings.items() if token in run)
+            )
+            self._matches[token] = matches
+        return matches
+
+    def choose(self, voice_description: str) -> str | None:
+        """voice_id scoring highest for the description; first voice on ties."""
+        if not self.voice_ids:
+            return None
+        scores: Counter[int] = Counter()
+        for token in tokenize(voice_description):
+            for position in self._voices_containing(token):
+                scores[position] += 2
+        wanted = voice_description.lower()
+        for boost_index, (keyword, _, _, points) in enumerate(_LABEL_BOOSTS):
+            if keyword in wanted:
+                for position in self._boosted[boost_index]:
+                    scores[position] += points
+        if not scores:
+            return self.voice_ids[0]
+        best = min(scores, key=lambda position: (-scores[position], position))
+        return self.voice_ids[best]
+
+
+class VoiceCatalog:
+    """Voice list fetched once, indexed, and refreshed in the background on a TTL."""
+
+    def __init__(self, fetch: VoiceFetcher, ttl_seconds: float):
+        self._fetch = fetch
+        self._ttl = ttl_seconds
+        self._index = VoiceIndex([])
+        self._fetched_at = 0.0
+        self._refreshing: asyncio.Task | None = None
+
+    async def _refresh(self) -> None:
+        try:
+            voices = await self._fetch()
+        except Exception:
+            logger.exception("Voice catalog refresh failed; keeping %d cached voices", len(self._index))
+            return
+        self._index = await asyncio.to_thread(VoiceIndex, voices)
+        self._fetched_at = time.monotonic()
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        return self._refreshing
+
+    async def get_index(self) -> VoiceIndex:
+        """Current index; waits only for the very first fetch."""
+        if not self._fetched_at:
+            await asyncio.shield(self._start_refresh())
+        elif time.monotonic() - self._fetched_at > self._ttl:
+            self._start_refresh()
+        return self._index
+
+    async def choose(self, voice_description: str) -> str | None:
+        index = await self.get_index()
+        return index.choose(voice_description)
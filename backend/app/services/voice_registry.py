@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from app.config import settings
+from app.services.voice_catalog import tokenize
+
+logger = logging.getLogger(__name__)
+
+_FEMALE_WORDS = {"female", "woman", "girl", "lady", "feminine", "mother", "grandmother", "queen"}
+_MALE_WORDS = {"male", "man", "boy", "gentleman", "masculine", "father", "grandfather", "king"}
+# Words that say nothing about how a particular voice should sound.
+_FILLER_WORDS = {"voice", "with", "and", "the", "speaking", "speaks", "that", "who", "for", "like"}
+
+
+class VoiceSignature(NamedTuple):
+    tokens: frozenset[str]
+    gender: str
+    accent: str
+
+
+def voice_signature(voice_description: str) -> VoiceSignature:
+    """Normalized token signature of a voice description plus hard traits."""
+    tokens = tokenize(voice_description) - _FILLER_WORDS
+    gender = ""
+    if tokens & _FEMALE_WORDS:
+        gender = "female"
+    elif tokens & _MALE_WORDS:
+        gender = "male"
+    accent_match = re.search(r"([a-z]+)[\s-]+accent", voice_description.lower())
+    accent = accent_match.group(1) if accent_match else ""
+    return VoiceSignature(frozenset(tokens), gender, accent)
+
+
+def _similarity(a: VoiceSignature, b: VoiceSignature) -> float:
+    # Never cross gender or accent, however similar the rest of the wording is.
+    if a.gender != b.gender or a.accent != b.accent:
+        return 0.0
+    if not a.tokens or not b.tokens:
+        return 0.0
+    return len(a.tokens & b.tokens) / len(a.tokens | b.tokens)
+
+
+class VoiceRegistry:
+    """Voices already created for past characters, matched by description.
+
+    Entries live in memory and, when VOICE_REGISTRY_DB_PATH is set, in SQLite
+    so designed voices survive restarts and are shared between workers. Both
+    hold at most max_entries voices: memory evicts the least recently matched,
+    SQLite the least recently created.
+    """
+
+    def __init__(self, min_similarity: float, max_entries: int, db_path: str = ""):
+        self._min_similarity = min_similarity
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, VoiceSignature] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False) if db_path else None
+        if self._conn is not None:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS voices ("
+                    " voice_id TEXT PRIMARY KEY,"
+                    " voice_description TEXT NOT NULL,"
+                    " created_at REAL NOT NULL)"
+                )
+                rows = self._conn.execute(
+                    "SELECT voice_id, voice_description FROM voices"
+                    " ORDER BY created_at DESC LIMIT ?",
+                    (max_entries,),
+                ).fetchall()
+            for voice_id, description in reversed(rows):
+                self._entries[voice_id] = voice_signature(description)
+
+    def match(self, voice_description: str) -> str | None:
+        """Closest registered voice at or above the similarity threshold."""
+        wanted = voice_signature(voice_description)
+        best_id = None
+        best_score = self._min_similarity
+        for voice_id, signature in self._entries.items():
+            score = _similarity(wanted, signature)
+            if score >= best_score:
+                best_id, best_score = voice_id, score
+        if best_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+        return best_id
+
+    def _persist(self, voice_id: str, voice_description: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO voices VALUES (?, ?, ?)",
+                (voice_id, voice_description, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM voices WHERE voice_id IN ("
+                " SELECT voice_id FROM voices ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    async def register(self, voice_description: str, voice_id: str) -> None:
+        self._entries[voice_id] = voice_signature(voice_description)
+        self._entries.move_to_end(voice_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        if self._conn is None:
+            return
+        try:
+            await asyncio.to_thread(self._persist, voice_id, voice_description)
+        except sqlite3.Error:
+            logger.exception("Failed to persist voice %s", voice_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+voice_registry = VoiceRegistry(
+    min_similarity=settings.voice_reuse_min_similarity,
+    max_entries=settings.voice_registry_max_entries,
+    db_path=settings.voice_registry_db_path,
+)
@@ -0,0 +1,179 @@
+"""Build characters ahead of time and write them to a character pack.
+
+Runs the character build (research, character creation, voice design) for
+each entity, at most --concurrency at once, and writes every complete
+character to a pack file. Builds get --deadline seconds each rather than
+the interactive identify deadline, and a build where a stage fell back is
+retried up to --attempts times in total. Servers memory-map the pack through
+CHARACTER_PACK_PATH and serve those entities without any upstream call.
+Run from the backend directory:
+
+    python -m app.warmup "Eiffel Tower" "Big Ben" --output characters.pack
+    python -m app.warmup --file popular.txt --concurrency 8 --merge
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.models.schemas import IdentifyResponse
+from app.prompts.identify_prompt import PROMPT_VERSION
+from app.services.character_cache import character_cache, character_key
+from app.services.character_pack import open_pack, write_pack
+from app.services.deadlines import Deadline
+from app.services.clients import clients
+from app.services.gemini_service import create_character_from_entity
+
+logger = logging.getLogger(__name__)
+
+_STAGES = ("research", "character", "voice")
+
+
+async def _build(entity: str, deadline_seconds: float) -> tuple[dict, IdentifyResponse | None]:
+    """Build one character; returns its report and the character if complete."""
+    key = character_key(entity)
+    cached = await character_cache.get(key) is not None
+    start = time.perf_counter()
+    finished_ms: dict[str, float] = {}
+
+    async def on_event(stage: str, payload: dict) -> None:
+        finished_ms[stage] = (time.perf_counter() - start) * 1000
+
+    try:
+        response = await create_character_from_entity(
+            entity, on_event, Deadline(deadline_seconds)
+        )
+    except Exception:
+        logger.exception("Warm-up failed for %s", entity)
+        return {"entity": entity, "status": "failed", "stages_ms": finished_ms}, None
+    report = {
+        "entity": entity,
+        "stages_ms": finished_ms,
+        "total_ms": (time.perf_counter() - start) * 1000,
+    }
+    # Only complete builds are cached, so a miss here means a stage fell back.
+    if cached:
+        report["status"] = "cached"
+    elif await character_cache.get(key) is not None:
+        report["status"] = "built"
+    else:
+        report["status"] = "degraded"
+        return report, None
+    return report, response
+
+
+async def _warm(
+    entity: str, slots: asyncio.Semaphore, attempts: int, deadline_seconds: float
+) -> tuple[dict, IdentifyResponse | None]:
+    async with slots:
+        for attempt in range(1, attempts + 1):
+            report, response = await _build(entity, deadline_seconds)
+            report["attempts"] = attempt
+            if response is not None:
+                break
+        return report, response
+
+
+async def warm_up(
+    entities: list[str],
+    output: str,
+    concurrency: int,
+    merge: bool,
+    attempts: int = 2,
+    deadline_seconds: float = 300.0,
+) -> list[dict]:
+    # The pack must hold each character's final voice, not the default voice
+    # an async design would hand out first.
+    settings.voice_design_mode = "sync"
+    # Nobody is waiting on these builds; only the warm-up deadline bounds
+    # a stage, not the interactive per-stage timeouts.
+    settings.research_timeout_seconds = deadline_seconds
+    settings.character_timeout_seconds = deadline_seconds
+    settings.voice_timeout_seconds = deadline_seconds
+    # Rebuild entities rather than serving them from the pack being replaced.
+    character_cache.pack = None
+
+    characters: dict[str, IdentifyResponse] = {}
+    if merge:
+        # A pack built with another model or prompt version is not opened,
+        # so none of its stale characters are carried over.
+        existing = open_pack(output, settings.gemini_model, PROMPT_VERSION)
+        if existing is not None:
+            characters.update(existing.items())
+            existing.close()
+
+    unique: dict[str, str] = {}
+    for entity in entities:
+        unique.setdefault(character_key(entity), entity)
+    slots = asyncio.Semaphore(concurrency)
+    await clients.start()
+    try:
+        results = await asyncio.gather(
+            *(_warm(entity, slots, attempts, deadline_seconds) for entity in unique.values())
+        )
+    finally:
+        await clients.close()
+
+    for report, response in results:
+        if response is not None:
+            characters[character_key(report["entity"])] = response
+    size = write_pack(output, characters, settings.gemini_model, PROMPT_VERSION)
+
+    header = "".join(f"{stage + ' ms':>13}" for stage in _STAGES)
+    print(f"{'entity':<32} {'status':<9}{'tries':>6}{header}{'total ms':>10}")
+    for report, _ in results:
+        stages = "".join(
+            f"{report['stages_ms'][stage]:>13.0f}" if stage in report["stages_ms"] else f"{'-':>13}"
+            for stage in _STAGES
+        )
+        total = f"{report['total_ms']:>10.0f}" if "total_ms" in report else f"{'-':>10}"
+        print(
+            f"{report['entity'][:32]:<32} {report['status']:<9}{report['attempts']:>6}"
+            f"{stages}{total}"
+        )
+    print(f"Wrote {len(characters)} characters ({size / 1024:.0f} KiB) to {output}")
+    return [report for report, _ in results]
+
+
+def _read_entities(path: Path) -> list[str]:
+    lines = (line.strip() for line in path.read_text().splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entities", nargs="*", help="entity names, e.g. \"Eiffel Tower\"")
+    parser.add_argument("--file", type=Path, help="file with one entity per line")
+    parser.add_argument("--output", default=settings.character_pack_path or "characters.pack")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=2, help="builds per entity")
+    parser.add_argument(
+        "--deadline", type=float, default=300.0, help="seconds allowed per build"
+    )
+    parser.add_argument(
+        "--merge", action="store_true", help="keep characters already in the output pack"
+    )
+    args = parser.parse_args()
+    entities = list(args.entities)
+    if args.file is not None:
+        entities += _read_entities(args.file)
+    if not entities:
+        parser.error("no entities given")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(
+        warm_up(
+            entities,
+            args.output,
+            max(1, args.concurrency),
+            args.merge,
+            max(1, args.attempts),
+            args.deadline,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
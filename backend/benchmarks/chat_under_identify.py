@@ -0,0 +1,151 @@
+"""Load test: /api/chat latency while slow /api/identify requests are in flight.
+
+Gemini and ElevenLabs are replaced with in-process fakes that sleep on the
+event loop, so the numbers reflect the server's scheduling rather than
+upstream quota. The Gemini rate limit is off unless --gemini-rate is given;
+chat demand here far exceeds any realistic per-worker limit, so with one the
+numbers measure the limiter instead. Run from the backend directory:
+
+    python -m benchmarks.chat_under_identify --chats 200 --identifies 8
+    python -m benchmarks.chat_under_identify --gemini-rate 25
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import itertools
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+import httpx
+from PIL import Image
+
+from app import main
+from app.services import gemini_service
+from app.services.scheduler import gemini_scheduler
+
+
+def _noise_png() -> str:
+    # Distinct noise per request, so neither the image index nor the
+    # character cache short-circuits the pipeline under test.
+    output = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode()
+
+
+class _FakeModels:
+    def __init__(self, slow_s: float, fast_s: float):
+        self.slow_s = slow_s
+        self.fast_s = fast_s
+        self.entities = itertools.count(1)
+
+    async def generate_content(self, *, model, contents, config=None):
+        if isinstance(config, dict) and "system_instruction" in config:
+            await asyncio.sleep(self.fast_s)
+            return SimpleNamespace(text="Hello there, friend!", candidates=[], usage_metadata=None)
+        await asyncio.sleep(self.slow_s)
+        if isinstance(contents, list):
+            return SimpleNamespace(text=f"Landmark {next(self.entities)}", candidates=[])
+        return SimpleNamespace(text='{"research_summary": "Built in 1889."}', candidates=[])
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        await asyncio.sleep(self.slow_s)
+
+        async def chunks():
+            yield SimpleNamespace(text='{"name": "Eiffel Tower", "voice_description": "A grand voice",')
+            yield SimpleNamespace(text=' "greeting": "Bonjour!"}')
+
+        return chunks()
+
+
+def _install_fakes(slow_s: float, fast_s: float) -> None:
+    fake = SimpleNamespace(aio=SimpleNamespace(models=_FakeModels(slow_s, fast_s)))
+    gemini_service._get_client = lambda: fake
+
+    async def fake_voice_for_character(voice_description: str, preview_text: str):
+        await asyncio.sleep(slow_s)
+        return "fake-voice", None
+
+    gemini_service.voice_for_character = fake_voice_for_character
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _chat_latencies(client: httpx.AsyncClient, count: int, concurrency: int) -> list[float]:
+    body = {
+        "entity": "Eiffel Tower",
+        "character_profile": {
+            "name": "Eiffel Tower",
+            "backstory": "I was built in 1889.",
+            "personality_traits": ["proud"],
+            "speaking_style": "Grand.",
+            "voice_description": "A deep voice.",
+            "fun_facts": ["I am tall."],
+        },
+        "conversation_history": [{"role": "user", "text": "Hi!"}],
+    }
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one() -> None:
+        async with slots:
+            start = time.perf_counter()
+            response = await client.post("/api/chat", json=body)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return latencies
+
+
+def _report(label: str, latencies: list[float]) -> None:
+    print(
+        f"{label:<22} n={len(latencies):<5} "
+        f"p50={_percentile(latencies, 50):7.1f}ms "
+        f"p99={_percentile(latencies, 99):7.1f}ms "
+        f"mean={statistics.mean(latencies):7.1f}ms"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    _install_fakes(args.slow, args.fast)
+    gemini_scheduler.set_rate(args.gemini_rate)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        baseline = await _chat_latencies(client, args.chats, args.concurrency)
+
+        identifies = [
+            asyncio.create_task(
+                client.post("/api/identify", json={"image": f"data:image/png;base64,{_noise_png()}"})
+            )
+            for _ in range(args.identifies)
+        ]
+        await asyncio.sleep(0)
+        loaded = await _chat_latencies(client, args.chats, args.concurrency)
+        await asyncio.gather(*identifies)
+
+    print(f"gemini rate limit: {f'{args.gemini_rate:g} req/s' if args.gemini_rate else 'none'}")
+    _report("chat (idle)", baseline)
+    _report("chat (identify load)", loaded)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--identifies", type=int, default=8)
+    parser.add_argument("--slow", type=float, default=2.0, help="seconds per identify-stage call")
+    parser.add_argument("--fast", type=float, default=0.05, help="seconds per chat call")
+    parser.add_argument("--gemini-rate", type=float, default=0.0, help="req/s limit, 0 for none")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
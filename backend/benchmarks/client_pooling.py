@@ -0,0 +1,115 @@
+"""Benchmark: per-call httpx clients vs the shared pooled client.
+
+Starts a local HTTPS server with a throwaway self-signed certificate (made
+with the openssl command-line tool), then
+issues the same sequential requests twice: once opening a fresh
+httpx.AsyncClient per request (the old elevenlabs_service pattern, paying a
+TCP + TLS handshake each time) and once through a pooled client built the
+same way as clients.http. Run from the backend directory:
+
+    python -m benchmarks.client_pooling --requests 200
+"""
+
+import argparse
+import asyncio
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+from app.services.clients import build_http_client
+
+
+async def _upstream(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    headers = [(b"content-type", b"application/json")]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": b'{"voices": []}'})
+
+
+def _write_self_signed(directory: Path) -> tuple[str, str]:
+    key_path = directory / "key.pem"
+    cert_path = directory / "cert.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "ec",
+            "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+            "-keyout", str(key_path), "-out", str(cert_path),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return str(key_path), str(cert_path)
+
+
+def _start_server(port: int, key_path: str, cert_path: str) -> uvicorn.Server:
+    config = uvicorn.Config(
+        _upstream,
+        host="127.0.0.1",
+        port=port,
+        ssl_keyfile=key_path,
+        ssl_certfile=cert_path,
+        log_level="warning",
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def _summary(label: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    print(
+        f"{label:<18} mean={statistics.mean(samples):6.2f}ms "
+        f"p50={statistics.median(samples):6.2f}ms p99={p99:6.2f}ms"
+    )
+
+
+async def run(args: argparse.Namespace, cert_path: str) -> None:
+    url = f"https://localhost:{args.port}/v1/voices"
+    verify = ssl.create_default_context(cafile=cert_path)
+
+    per_call: list[float] = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(verify=verify) as client:
+            (await client.get(url)).raise_for_status()
+        per_call.append((time.perf_counter() - start) * 1000)
+
+    pooled: list[float] = []
+    async with build_http_client(verify=verify) as client:
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            (await client.get(url)).raise_for_status()
+            pooled.append((time.perf_counter() - start) * 1000)
+
+    _summary("per-call client", per_call)
+    _summary("pooled client", pooled)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8443)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        key_path, cert_path = _write_self_signed(Path(tmp))
+        server = _start_server(args.port, key_path, cert_path)
+        try:
+            asyncio.run(run(args, cert_path))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,358 @@
+"""Local stand-ins for the Gemini, Deepgram and ElevenLabs HTTP APIs.
+
+One FastAPI app serves the subset of each API the backend calls, with
+realistic payloads (research and character JSON, MP3 frames, a voice list)
+and lognormal latencies scaled by --scale. A --failure-rate share of
+requests gets a 503 and a --rate-limit-rate share a 429 with Retry-After. Point the backend at it with
+
+    GEMINI_BASE_URL=http://127.0.0.1:9100
+    DEEPGRAM_BASE_URL=http://127.0.0.1:9100
+    ELEVENLABS_BASE_URL=http://127.0.0.1:9100/v1
+
+Used by benchmarks.load_suite; can also be run on its own from the backend
+directory:
+
+    python -m benchmarks.fake_upstreams --port 9100 --scale 0.1
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Median latency in seconds of each operation at --scale 1, roughly what the
+# real APIs take.
+_MEDIAN_SECONDS = {
+    "identify": 1.2,
+    "research": 2.5,
+    "character_first": 0.5,
+    "character_chunk": 0.15,
+    "chat_first": 0.4,
+    "chat_chunk": 0.08,
+    "summary": 0.8,
+    "cache_create": 0.3,
+    "transcribe": 0.4,
+    "tts_first": 0.25,
+    "voices": 0.2,
+    "voice_preview": 3.0,
+    "voice_create": 0.8,
+}
+_LANDMARKS = [
+    "Eiffel Tower", "Big Ben", "Statue of Liberty", "Colosseum", "Taj Mahal",
+    "Sydney Opera House", "Golden Gate Bridge", "Tower Bridge", "Leaning Tower of Pisa",
+    "Sagrada Familia", "Brandenburg Gate", "Christ the Redeemer", "Mount Rushmore",
+]
+_ENTITY_PATTERN = re.compile("(?:" + "|".join(map(re.escape, _LANDMARKS)) + r")(?: \d+)?")
+_CHAT_REPLY = (
+    "Ooh, what a great question! I was built a very long time ago by clever people "
+    "with big ideas. Every day I watch thousands of visitors wave at me. "
+    "Do you want to hear my favourite secret?"
+)
+# One 128 kbps, 44.1 kHz MPEG-1 Layer III frame: a real header plus filler.
+_MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+_MP3_BYTES_PER_SECOND = 16_000
+
+
+@dataclass
+class FakeProfile:
+    scale: float = 0.1
+    sigma: float = 0.4
+    failure_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    distinct_entities: bool = True
+
+
+def _character_json(entity: str) -> str:
+    return json.dumps(
+        {
+            "name": entity,
+            "voice_description": "A warm, deep male voice with a gentle British accent, "
+            "slow and wise like a storytelling grandfather",
+            "greeting": f"Hello there, explorer! I'm {entity}, and I've been waiting for you!",
+            "backstory": f"{entity} has stood for well over a century, watching the city "
+            "grow around it. " * 4,
+            "personality_traits": ["wise", "playful", "proud", "curious", "kind"],
+            "speaking_style": "Speaks slowly, with dramatic pauses and lots of wonder.",
+            "fun_facts": [
+                "I was nearly taken down once, but people loved me too much!",
+                "On hot days I grow a little taller.",
+                "I have been painted many times.",
+            ],
+        }
+    )
+
+
+def _research_json(entity: str) -> str:
+    return json.dumps(
+        {
+            "research_summary": f"{entity} is a famous landmark built in the 19th century. "
+            "It was designed by a celebrated engineer and draws millions of visitors. " * 3,
+            "canonical_facts": [
+                f"{entity} was completed in 1889.",
+                f"{entity} is made of wrought iron.",
+                f"{entity} is repainted every seven years.",
+                f"More than six million people visit {entity} every year.",
+            ],
+            "source_urls": ["https://en.wikipedia.org/wiki/Landmark"],
+        }
+    )
+
+
+def _candidate_response(text: str, grounded: bool = False) -> dict:
+    candidate: dict = {
+        "content": {"role": "model", "parts": [{"text": text}]},
+        "finishReason": "STOP",
+    }
+    if grounded:
+        candidate["groundingMetadata"] = {
+            "groundingChunks": [
+                {"web": {"uri": "https://en.wikipedia.org/wiki/Landmark", "title": "Landmark"}}
+            ]
+        }
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": 850,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": 850 + len(text) // 4,
+        },
+    }
+
+
+def _voices() -> list[dict]:
+    accents = ["british", "american", "irish", "australian", "indian"]
+    voices = []
+    for i in range(60):
+        voices.append(
+            {
+                "voice_id": f"voice{i:04d}",
+                "name": f"Voice {i}",
+                "category": "premade" if i % 3 else "generated",
+                "description": "A friendly narrator voice",
+                "labels": {
+                    "accent": accents[i % len(accents)],
+                    "gender": "female" if i % 2 else "male",
+                    "age": ["young", "middle aged", "old"][i % 3],
+                    "use_case": ["narration", "conversational", "audiobook"][i % 3],
+                },
+            }
+        )
+    return voices
+
+
+def create_app(profile: FakeProfile) -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+    entities = itertools.count()
+    voice_ids = itertools.count()
+
+    def delay(operation: str) -> float:
+        median = _MEDIAN_SECONDS[operation] * profile.scale
+        return random.lognormvariate(0.0, profile.sigma) * median
+
+    async def wait(operation: str) -> None:
+        await asyncio.sleep(delay(operation))
+
+    def failed() -> bool:
+        return random.random() < profile.failure_rate + profile.rate_limit_rate
+
+    def unavailable() -> JSONResponse:
+        if random.random() * (profile.failure_rate + profile.rate_limit_rate) < profile.rate_limit_rate:
+            retry_info = {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "1s"}
+            return JSONResponse(
+                {
+                    "error": {
+                        "code": 429,
+                        "message": "Fake rate limit",
+                        "status": "RESOURCE_EXHAUSTED",
+                        "details": [retry_info],
+                    }
+                },
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        return JSONResponse(
+            {"error": {"code": 503, "message": "Fake upstream failure", "status": "UNAVAILABLE"}},
+            status_code=503,
+        )
+
+    def next_entity() -> str:
+        n = next(entities)
+        base = _LANDMARKS[n % len(_LANDMARKS)]
+        return f"{base} {n}" if profile.distinct_entities else base
+
+    def classify(body: dict) -> str:
+        contents = json.dumps(body.get("contents", []))
+        if "inlineData" in contents:
+            return "identify"
+        if "googleSearch" in json.dumps(body.get("tools", [])):
+            return "research"
+        if "NOTES SO FAR" in contents:
+            return "summary"
+        if body.get("generationConfig", {}).get("responseMimeType") == "application/json":
+            return "character"
+        return "chat"
+
+    def entity_from(body: dict) -> str:
+        match = _ENTITY_PATTERN.search(json.dumps(body.get("contents", [])))
+        return match.group(0) if match else "Mystery Landmark"
+
+    @app.post("/{version}/models/{model}:generateContent")
+    async def generate_content(version: str, model: str, request: Request):
+        body = await request.json()
+        kind = classify(body)
+        await wait(kind if kind in ("identify", "research", "summary") else "chat_first")
+        if failed():
+            return unavailable()
+        if kind == "identify":
+            return _candidate_response(next_entity())
+        if kind == "research":
+            return _candidate_response(_research_json(entity_from(body)), grounded=True)
+        if kind == "summary":
+            return _candidate_response("The child asked about history and loves trains.")
+        if kind == "character":
+            return _candidate_response(_character_json(entity_from(body)))
+        return _candidate_response(_CHAT_REPLY)
+
+    @app.post("/{version}/models/{model}:streamGenerateContent")
+    async def stream_generate_content(version: str, model: str, request: Request):
+        body = await request.json()
+        kind = classify(body)
+        prefix = "character" if kind == "character" else "chat"
+        await wait(f"{prefix}_first")
+        if failed():
+            return unavailable()
+        text = _character_json(entity_from(body)) if kind == "character" else _CHAT_REPLY
+        pieces = [text[i : i + 60] for i in range(0, len(text), 60)]
+
+        async def events() -> AsyncIterator[str]:
+            for index, piece in enumerate(pieces):
+                if index:
+                    await wait(f"{prefix}_chunk")
+                yield "data: " + json.dumps(_candidate_response(piece)) + "\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/{version}/cachedContents")
+    async def create_cached_content(version: str, request: Request):
+        await wait("cache_create")
+        if failed():
+            return unavailable()
+        expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600))
+        return {"name": f"cachedContents/{os.urandom(6).hex()}", "expireTime": expire}
+
+    @app.post("/v1/listen")
+    async def listen(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        await wait("transcribe")
+        if failed():
+            return unavailable()
+        return {
+            "metadata": {
+                "request_id": os.urandom(8).hex(),
+                "created": "2026-01-01T00:00:00Z",
+                "duration": size / 16_000,
+                "channels": 1,
+                "models": ["nova-2"],
+            },
+            "results": {
+                "channels": [
+                    {
+                        "alternatives": [
+                            {
+                                "transcript": "why is the sky blue and how tall are you",
+                                "confidence": 0.97,
+                                "words": [],
+                            }
+                        ]
+                    }
+                ]
+            },
+        }
+
+    @app.get("/v1/voices")
+    async def voices():
+        await wait("voices")
+        if failed():
+            return unavailable()
+        return {"voices": _voices()}
+
+    def mp3_for(text: str) -> bytes:
+        seconds = max(1.0, len(text) / 15)
+        frames = int(seconds * _MP3_BYTES_PER_SECOND / len(_MP3_FRAME))
+        return _MP3_FRAME * frames
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def tts_stream(voice_id: str, request: Request):
+        body = await request.json()
+        await wait("tts_first")
+        if failed():
+            return unavailable()
+        audio = mp3_for(body.get("text", ""))
+
+        async def chunks() -> AsyncIterator[bytes]:
+            for i in range(0, len(audio), 4096):
+                yield audio[i : i + 4096]
+                # ElevenLabs streams several times faster than real time.
+                await asyncio.sleep(4096 / _MP3_BYTES_PER_SECOND / 8 * profile.scale)
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+    @app.post("/v1/text-to-voice/create-previews")
+    async def create_previews():
+        await wait("voice_preview")
+        if failed():
+            return unavailable()
+        return {"previews": [{"generated_voice_id": os.urandom(8).hex()}]}
+
+    @app.post("/v1/text-to-voice/create-voice-from-preview")
+    async def create_voice():
+        await wait("voice_create")
+        if failed():
+            return unavailable()
+        return {"voice_id": f"designed{next(voice_ids):06d}"}
+
+    return app
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--scale", type=float, default=0.1, help="latency multiplier")
+    parser.add_argument("--sigma", type=float, default=0.4, help="lognormal spread")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--same-entity", action="store_true", help="identify always returns one landmark"
+    )
+
+
+def profile_from(args: argparse.Namespace) -> FakeProfile:
+    return FakeProfile(
+        scale=args.scale,
+        sigma=args.sigma,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        distinct_entities=not args.same_entity,
+    )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(profile_from(args)), port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main_cli()
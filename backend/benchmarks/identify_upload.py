@@ -0,0 +1,102 @@
+"""Benchmark: JSON/base64 vs multipart /api/identify request handling.
+
+Sends the same photo through POST /api/identify (base64 data URI in JSON) and
+POST /api/identify/upload (multipart) in-process, with the Gemini and
+character stages faked out. Reports per-request wall time and the tracemalloc
+peak of Python allocations, i.e. the cost of receiving and parsing the body.
+By default the resize stage is stubbed too, to isolate parsing; pass
+--with-resize to include it. Run from the backend directory:
+
+    python -m benchmarks.identify_upload --megapixels 12 --runs 10
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import statistics
+import time
+import tracemalloc
+
+import httpx
+from PIL import Image
+
+from app import main
+from app.services import gemini_service
+from app.services.image_service import PreparedImage, _read_source
+
+
+def _photo(megapixels: float) -> bytes:
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Noise compresses poorly, like a real phone photo.
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def _install_fakes(with_resize: bool) -> None:
+    async def fake_identify(mime_type: str, image_bytes: bytes, deadline=None) -> str:
+        return "Eiffel Tower"
+
+    async def fake_character(entity: str, on_event=None, deadline=None):
+        return main._fallback_identify_response(entity, "Hi!")
+
+    async def passthrough(mime_type, image):
+        return PreparedImage(mime_type, await asyncio.to_thread(_read_source, image), None)
+
+    gemini_service.identify_entity_from_image = fake_identify
+    gemini_service.create_character_from_entity = fake_character
+    if not with_resize:
+        gemini_service.prepare_image = passthrough
+
+
+async def _measure(send, runs: int) -> tuple[list[float], list[int]]:
+    times: list[float] = []
+    peaks: list[int] = []
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = await send()
+        times.append((time.perf_counter() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        response.raise_for_status()
+    return times, peaks
+
+
+async def run(args: argparse.Namespace) -> None:
+    _install_fakes(args.with_resize)
+    photo = _photo(args.megapixels)
+    data_uri = "data:image/jpeg;base64," + base64.b64encode(photo).decode()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def send_json():
+            return await client.post("/api/identify", json={"image": data_uri})
+
+        async def send_multipart():
+            files = {"image": ("photo.jpg", photo, "image/jpeg")}
+            return await client.post("/api/identify/upload", files=files)
+
+        print(f"photo: {len(photo) / 1e6:.1f} MB jpeg, {len(data_uri) / 1e6:.1f} MB as data URI")
+        for label, send in (("json/base64", send_json), ("multipart", send_multipart)):
+            times, peaks = await _measure(send, args.runs)
+            print(
+                f"{label:<12} time p50={statistics.median(times):7.1f}ms "
+                f"peak p50={statistics.median(peaks) / 1e6:6.1f}MB"
+            )
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--with-resize", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
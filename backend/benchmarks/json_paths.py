@@ -0,0 +1,150 @@
+"""Microbenchmark: response serialization and model-output JSON parsing.
+
+Serialization compares, for an IdentifyResponse with a full profile:
+  fastapi   response_model validation + jsonable serialization + json.dumps
+            (the default path for a route returning a model)
+  orjson    the same validation, rendered by ORJSONResponse
+  dump_json model_dump_json() into a plain Response
+  direct    app.main._model_response: pydantic-core JSON bytes, no validation
+            (what the hot routes return)
+
+Parsing compares the previous _parse_json_response (fence strip, json.loads,
+then a brace-slice retry) with the single-pass raw_decode extractor, on
+clean, fenced, prose-wrapped and truncated model output; truncated output
+must fail so the caller falls back. Each row reports time per call
+and the peak memory allocated during one call. Run from the backend
+directory:
+
+    python -m benchmarks.json_paths --iterations 20000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.main import _model_response
+from app.models.schemas import CharacterProfile, IdentifyResponse
+from app.services.gemini_service import _parse_json_response
+from benchmarks.fake_upstreams import _character_json
+
+
+def _legacy_parse(text: str) -> dict:
+    """_parse_json_response before the single-pass extractor."""
+    raw = text.strip()
+    if raw.startswith("```"):
+        raw = raw.split("\n", 1)[1].rsplit("```", 1)[0]
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        start = raw.find("{")
+        end = raw.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            return json.loads(raw[start : end + 1])
+        raise
+
+
+def _sample_response() -> IdentifyResponse:
+    character = json.loads(_character_json("Eiffel Tower"))
+    profile = CharacterProfile(
+        **{k: character[k] for k in CharacterProfile.model_fields if k in character},
+        research_summary="The Eiffel Tower is a wrought-iron lattice tower in Paris. " * 6,
+        canonical_facts=[f"Fact number {i} about the tower and its long history." for i in range(8)],
+        source_urls=[f"https://example.org/eiffel/{i}" for i in range(8)],
+    )
+    return IdentifyResponse(
+        entity="Eiffel Tower",
+        greeting=character["greeting"] + " 🗼",
+        character_profile=profile,
+        voice_id="designed000001",
+        session_id="QLmlqZIj_DPqc64sCIiTSQ",
+    )
+
+
+def _drive(coroutine: Any) -> Any:
+    """Result of a coroutine that never suspends, without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def _measure(call: Callable[[], Any], iterations: int) -> tuple[float, float]:
+    """(microseconds per call, peak KiB allocated by one call)."""
+    call()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    per_call_us = (time.perf_counter() - start) / iterations * 1e6
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    call()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return per_call_us, peak / 1024
+
+
+def run(iterations: int) -> None:
+    response = _sample_response()
+    field = create_model_field("Response_identify", IdentifyResponse, mode="serialization")
+
+    def fastapi_default() -> bytes:
+        content = _drive(serialize_response(field=field, response_content=response))
+        return JSONResponse(content).body
+
+    def orjson_class() -> bytes:
+        content = _drive(serialize_response(field=field, response_content=response))
+        return ORJSONResponse(content).body
+
+    def dump_json() -> bytes:
+        return Response(response.model_dump_json(), media_type="application/json").body
+
+    def direct() -> bytes:
+        return _model_response(response).body
+
+    print(f"{'serialize':<22} {'us/call':>9} {'peak KiB':>9}")
+    for name, call in (
+        ("fastapi", fastapi_default),
+        ("orjson", orjson_class),
+        ("dump_json", dump_json),
+        ("direct", direct),
+    ):
+        per_call, peak = _measure(call, iterations)
+        print(f"{name:<22} {per_call:>9.1f} {peak:>9.1f}")
+
+    clean = _character_json("Eiffel Tower")
+    fenced = "```json\n" + clean + "\n```"
+    prose = "Here is the character:\n" + fenced + "\nWant changes? {just ask}"
+    truncated = clean[: len(clean) // 2]
+    print(f"\n{'parse':<22} {'us/call':>9} {'peak KiB':>9}")
+    for label, text in (
+        ("clean", clean),
+        ("fenced", fenced),
+        ("prose", prose),
+        ("truncated", truncated),
+    ):
+        for name, parse in (("legacy", _legacy_parse), ("raw_decode", _parse_json_response)):
+            try:
+                per_call, peak = _measure(lambda: parse(text), iterations)
+            except json.JSONDecodeError:
+                print(f"{label + ' ' + name:<22} {'fails':>9}")
+                continue
+            print(f"{label + ' ' + name:<22} {per_call:>9.1f} {peak:>9.1f}")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.iterations)
+
+
+if __name__ == "__main__":
+    main_cli()
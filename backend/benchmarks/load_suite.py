@@ -0,0 +1,253 @@
+"""Load test: throughput, latency percentiles and memory of the hot endpoints.
+
+Starts benchmarks.fake_upstreams and the backend (uvicorn, one worker) as
+subprocesses, with the backend's GEMINI_/DEEPGRAM_/ELEVENLABS_BASE_URL
+pointed at the fakes, so the real SDKs and connection pools are exercised
+without spending quota. /api/identify, /api/chat, /api/speech-to-text and
+/api/text-to-speech are then driven at increasing concurrency with distinct
+inputs, so caches do not hide the upstream path. Each endpoint and level
+reports throughput, p50/p95/p99 latency (full body read), errors and the
+backend's resident memory. Run from the backend directory:
+
+    python -m benchmarks.load_suite --concurrency 1 4 16 64 --requests 200
+    python -m benchmarks.load_suite --endpoints chat tts --scale 0.5 --failure-rate 0.02
+
+--json writes the results for comparison between runs. The backend's Gemini
+rate limit is set by --gemini-rate (0, no limit, by default) and printed
+with the results, so runs are compared under the same limit.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+from PIL import Image
+
+from benchmarks.fake_upstreams import add_profile_arguments
+
+ENDPOINTS = ("identify", "chat", "stt", "tts")
+
+_PROFILE = {
+    "name": "Eiffel Tower",
+    "backstory": "I have stood in Paris since 1889, watching the city sparkle. " * 3,
+    "personality_traits": ["proud", "playful", "curious", "kind", "dramatic"],
+    "speaking_style": "Speaks with a French flair and lots of wonder.",
+    "voice_description": "A grand, warm voice with a gentle French accent",
+    "fun_facts": ["I grow taller in summer!", "I have 1,665 steps.", "I was nearly torn down."],
+    "research_summary": "The Eiffel Tower is a wrought-iron lattice tower in Paris. " * 4,
+    "canonical_facts": ["Completed in 1889.", "Designed by Gustave Eiffel's company."],
+    "source_urls": ["https://en.wikipedia.org/wiki/Eiffel_Tower"],
+}
+
+Send = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _memory_mb(pid: int) -> tuple[float, float] | None:
+    """(resident, peak resident) of a process in MB, from /proc on Linux."""
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+    return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+
+
+def _photo(megapixels: float) -> str:
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Noise gives every photo its own perceptual hash, so none is deduplicated.
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode()
+
+
+def _senders(args: argparse.Namespace, total: int) -> dict[str, Send]:
+    photos = [_photo(args.photo_megapixels) for _ in range(total if "identify" in args.endpoints else 0)]
+    audio = os.urandom(48_000)  # about three seconds of Opus
+
+    async def identify(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/api/identify", json={"image": photos[i]})
+
+    async def chat(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        history = []
+        for turn in range(3):
+            history.append({"role": "user", "text": f"Question {turn} from visitor {i}?"})
+            history.append({"role": "assistant", "text": "What a wonderful question! " * 4})
+        history.append({"role": "user", "text": f"How tall are you, friend {i}?"})
+        return await client.post(
+            "/api/chat",
+            json={"entity": "Eiffel Tower", "character_profile": _PROFILE, "conversation_history": history},
+        )
+
+    async def stt(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        files = {"audio": (f"clip{i}.webm", audio, "audio/webm")}
+        return await client.post("/api/speech-to-text", files=files)
+
+    async def tts(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        text = f"Bonjour, explorer number {i}! I am so happy you came to visit me today."
+        return await client.post(
+            "/api/text-to-speech",
+            json={"text": text, "entity": "Eiffel Tower", "voice_id": "voice0001"},
+        )
+
+    return {"identify": identify, "chat": chat, "stt": stt, "tts": tts}
+
+
+async def _run_level(
+    client: httpx.AsyncClient, send: Send, concurrency: int, requests: int, offset: int
+) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors = 0
+    next_index = iter(range(offset, offset + requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                response = await send(client, i)
+                if response.is_error:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def _start(command: list[str], env: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+
+
+async def _wait_ready(url: str, process: subprocess.Popen) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError(f"{url} did not start")
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake_command = [
+        sys.executable, "-m", "benchmarks.fake_upstreams", "--port", str(fake_port),
+        "--scale", str(args.scale), "--sigma", str(args.sigma),
+        "--failure-rate", str(args.failure_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+    ]
+    if args.same_entity:
+        fake_command.append("--same-entity")
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": "fake",
+        "DEEPGRAM_API_KEY": "fake",
+        "ELEVENLABS_API_KEY": "fake",
+        "GEMINI_BASE_URL": fake_url,
+        "DEEPGRAM_BASE_URL": fake_url,
+        "ELEVENLABS_BASE_URL": f"{fake_url}/v1",
+        "AUDIO_CACHE_DIR": tempfile.mkdtemp(prefix="curiocity-bench-audio-"),
+        "CHARACTER_CACHE_DB_PATH": "",
+        "VOICE_REGISTRY_DB_PATH": "",
+        "SESSION_REDIS_URL": "",
+        "GEMINI_REQUESTS_PER_SECOND": str(args.gemini_rate),
+    }
+    app_command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(app_port), "--log-level", "warning",
+    ]
+    total = args.requests * len(args.concurrency)
+    senders = _senders(args, total)
+    fake = _start(fake_command, env)
+    backend = _start(app_command, env)
+    results: list[dict] = []
+    try:
+        await _wait_ready(f"{fake_url}/docs", fake)
+        await _wait_ready(f"http://127.0.0.1:{app_port}/health", backend)
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=None
+        ) as client:
+            print(f"gemini rate limit: {f'{args.gemini_rate:g} req/s' if args.gemini_rate else 'none'}")
+            print(
+                f"{'endpoint':<9} {'conc':>4} {'n':>5} {'req/s':>8} {'p50 ms':>8} "
+                f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'rss MB':>7} {'peak MB':>7}"
+            )
+            for endpoint in args.endpoints:
+                for level, concurrency in enumerate(args.concurrency):
+                    latencies, errors, elapsed = await _run_level(
+                        client, senders[endpoint], concurrency, args.requests, level * args.requests
+                    )
+                    cuts = statistics.quantiles(latencies, n=100)
+                    memory = _memory_mb(backend.pid)
+                    row = {
+                        "endpoint": endpoint,
+                        "concurrency": concurrency,
+                        "gemini_rate_limit": args.gemini_rate,
+                        "requests": len(latencies),
+                        "throughput_rps": len(latencies) / elapsed,
+                        "p50_ms": cuts[49] * 1000,
+                        "p95_ms": cuts[94] * 1000,
+                        "p99_ms": cuts[98] * 1000,
+                        "errors": errors,
+                        "rss_mb": memory[0] if memory else None,
+                        "peak_rss_mb": memory[1] if memory else None,
+                    }
+                    results.append(row)
+                    rss = f"{row['rss_mb']:7.0f} {row['peak_rss_mb']:7.0f}" if memory else f"{'n/a':>7} {'n/a':>7}"
+                    print(
+                        f"{endpoint:<9} {concurrency:>4} {row['requests']:>5} "
+                        f"{row['throughput_rps']:>8.1f} {row['p50_ms']:>8.1f} "
+                        f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {errors:>6} {rss}"
+                    )
+    finally:
+        for process in (backend, fake):
+            process.terminate()
+            process.wait(timeout=10)
+    return results
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=100, help="per endpoint and level")
+    parser.add_argument("--photo-megapixels", type=float, default=0.3)
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument(
+        "--gemini-rate", type=float, default=0.0, help="backend Gemini req/s limit, 0 for none"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,122 @@
+"""Microbenchmark: linear voice scoring vs the indexed voice catalog.
+
+Builds a synthetic catalog of several thousand voices and times choosing the
+best voice for a set of character descriptions, once with the previous
+per-request scan (re-tokenizing every voice blob) and once with VoiceIndex,
+and checks that both pick the same voices. The first indexed pass per
+description expands its tokens; later passes reuse that.
+Run from the backend directory:
+
+    python -m benchmarks.voice_catalog --voices 5000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from app.services.voice_catalog import VoiceIndex
+
+ACCENTS = ["american", "british", "irish", "australian", "french", "indian", "scottish"]
+GENDERS = ["male", "female", "neutral"]
+AGES = ["young", "middle aged", "old"]
+USE_CASES = ["narration", "audiobook", "conversational", "characters", "news"]
+WORDS = (
+    "warm gentle deep raspy bright calm wise playful grand soft booming cheerful "
+    "slow fast whimsical friendly storyteller elderly youthful energetic soothing"
+).split()
+
+DESCRIPTIONS = [
+    "A warm, wise elderly woman with a slight French accent, speaking slowly and grandly",
+    "A booming, cheerful older male voice with an Irish accent, great for story time",
+    "A playful young female storyteller voice, bright and energetic",
+    "A calm, deep male narrator with a British accent",
+]
+
+
+def _tokenize(text: str) -> set[str]:
+    return set(re.findall(r"[a-z]{3,}", (text or "").lower()))
+
+
+def _score_voice(voice: dict, voice_description: str) -> int:
+    """The scorer used before the catalog, kept here as the baseline."""
+    labels = voice.get("labels") or {}
+    blob = " ".join(
+        [voice.get("name", ""), voice.get("description", ""), str(labels), voice.get("category", "")]
+    ).lower()
+    score = 0
+    for token in _tokenize(voice_description):
+        if token in blob:
+            score += 2
+    accent = str(labels.get("accent", "")).lower()
+    gender = str(labels.get("gender", "")).lower()
+    age = str(labels.get("age", "")).lower()
+    use_case = str(labels.get("use_case", "")).lower()
+    if "irish" in voice_description.lower() and "irish" in accent:
+        score += 20
+    if "male" in voice_description.lower() and "male" in gender:
+        score += 12
+    if "female" in voice_description.lower() and "female" in gender:
+        score += 12
+    if "older" in voice_description.lower() and ("old" in age or "middle" in age):
+        score += 6
+    if "story" in voice_description.lower() and ("narration" in use_case or "audiobook" in use_case):
+        score += 6
+    return score
+
+
+def _synthetic_voices(count: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "voice_id": f"voice-{i:05d}",
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            "description": " ".join(rng.sample(WORDS, 6)),
+            "category": rng.choice(["premade", "generated", "cloned", "professional"]),
+            "labels": {
+                "accent": rng.choice(ACCENTS),
+                "gender": rng.choice(GENDERS),
+                "age": rng.choice(AGES),
+                "use_case": rng.choice(USE_CASES),
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def _time_per_call(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for description in DESCRIPTIONS:
+            fn(description)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(DESCRIPTIONS))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voices", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    voices = _synthetic_voices(args.voices)
+    start = time.perf_counter()
+    index = VoiceIndex(voices)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    linear_ms = _time_per_call(
+        lambda d: max(voices, key=lambda v: _score_voice(v, d)), args.repeats
+    )
+    linear_choices = [max(voices, key=lambda v: _score_voice(v, d))["voice_id"] for d in DESCRIPTIONS]
+    start = time.perf_counter()
+    indexed_choices = [index.choose(d) for d in DESCRIPTIONS]
+    first_ms = (time.perf_counter() - start) * 1000 / len(DESCRIPTIONS)
+    indexed_ms = _time_per_call(index.choose, args.repeats)
+    print(f"voices={args.voices} index build={build_ms:.1f}ms (once per refresh)")
+    print(f"linear scan  {linear_ms:8.3f} ms/choice")
+    print(f"indexed      {indexed_ms:8.3f} ms/choice  ({linear_ms / indexed_ms:.1f}x)")
+    print(f"indexed, first choice per description {first_ms:8.3f} ms")
+    print(f"same choices as linear scan: {'yes' if linear_choices == indexed_choices else 'NO'}")
+
+
+if __name__ == "__main__":
+    main_cli()